@@ -11,7 +11,7 @@ import numpy as np
 from ortools.constraint_solver import pywrapcp
 from ortools.constraint_solver import routing_enums_pb2
 
-from loggibud.v1.distances import calculate_distance_matrix_m, OSRMConfig
+from loggibud.v1.distances import get_distance_provider, OSRMConfig
 from loggibud.v1.types import (
     CVRPInstance,
     CVRPSolution,
@@ -38,6 +38,9 @@ class ORToolsParams(JSONDataclassMixin):
     osrm_config: Optional[OSRMConfig] = None
     """Config for calling OSRM distance service."""
 
+    distance_provider: Optional[str] = None
+    """Name of the distance provider (see `get_distance_provider`)."""
+
 
 def solve(
     instance: CVRPInstance,
@@ -84,9 +87,10 @@ def solve(
 
     # Compute the distance matrix between points.
     logger.info("Computing distance matrix.")
-    distance_matrix = (
-        calculate_distance_matrix_m(locations, config=params.osrm_config) * 10
-    ).astype(np.int32)
+    provider = get_distance_provider(
+        params.distance_provider, params.osrm_config
+    )
+    distance_matrix = (provider.matrix(locations) * 10).astype(np.int32)
 
     def distance_callback(src, dst):
         x = manager.IndexToNode(src)
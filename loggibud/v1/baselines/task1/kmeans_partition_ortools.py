@@ -20,7 +20,11 @@ from typing import Optional
 import numpy as np
 from sklearn.cluster import KMeans
 
-from loggibud.v1.types import CVRPInstance, CVRPSolution
+from loggibud.v1.types import (
+    CVRPInstance,
+    CVRPSolution,
+    ColumnarCVRPInstance,
+)
 from loggibud.v1.baselines.shared.ortools import (
     solve as ortools_solve,
     ORToolsParams,
@@ -67,25 +71,12 @@ def solve(
     logger.info(f"Clustering instance into {num_clusters} subinstances")
     clustering = KMeans(num_clusters, random_state=params.seed)
 
-    points = np.array(
-        [[d.point.lng, d.point.lat] for d in instance.deliveries]
-    )
-    clusters = clustering.fit_predict(points)
-
-    delivery_array = np.array(instance.deliveries)
-
-    subsinstance_deliveries = [
-        delivery_array[clusters == i] for i in range(num_clusters)
-    ]
+    columnar_instance = ColumnarCVRPInstance.from_instance(instance)
+    clusters = clustering.fit_predict(columnar_instance.coords)
 
     subinstances = [
-        CVRPInstance(
-            name=instance.name,
-            deliveries=subinstance.tolist(),
-            origin=instance.origin,
-            vehicle_capacity=instance.vehicle_capacity,
-        )
-        for subinstance in subsinstance_deliveries
+        columnar_instance.subinstance(clusters == i).to_instance()
+        for i in range(num_clusters)
     ]
 
     subsolutions = [
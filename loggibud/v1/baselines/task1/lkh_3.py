@@ -42,6 +42,9 @@ class LKHParams(JSONDataclassMixin):
     osrm_config: Optional[OSRMConfig] = None
     """Config for calling OSRM distance service."""
 
+    distance_provider: Optional[str] = None
+    """Name of the distance provider (see `get_distance_provider`)."""
+
 
 def solve(
     instance: CVRPInstance, params: Optional[LKHParams] = None
@@ -50,7 +53,10 @@ def solve(
 
     params = params or LKHParams()
 
-    conversion_params = TSPLIBConversionParams(osrm_config=params.osrm_config)
+    conversion_params = TSPLIBConversionParams(
+        osrm_config=params.osrm_config,
+        distance_provider=params.distance_provider,
+    )
     tsplib_instance = to_tsplib(instance, conversion_params)
 
     # LKH solution params, for details check the LKH documentation.
@@ -19,6 +19,7 @@ from tqdm import tqdm
 from loggibud.v1.types import (
     Delivery,
     CVRPInstance,
+    CVRPInstanceReader,
     CVRPSolution,
     CVRPSolutionVehicle,
 )
@@ -118,8 +119,7 @@ def route(model: KMeansGreedyModel, delivery: Delivery) -> KMeansGreedyModel:
             < model.subinstance.vehicle_capacity
         )
 
-    # TODO: We could make this method faster by using a route size table, but seems a bit
-    # overkill since it's not a bottleneck.
+    # Route occupations are cached, so each check takes constant time.
     feasible_routes = [
         (route_idx, route)
         for route_idx, route in enumerate(subsolution)
@@ -136,7 +136,7 @@ def route(model: KMeansGreedyModel, delivery: Delivery) -> KMeansGreedyModel:
         subsolution.append(route)
         route_idx = len(subsolution) - 1
 
-    route.deliveries.append(delivery)
+    route.append(delivery)
     subsolution[route_idx] = route
 
     return model
@@ -222,14 +222,16 @@ if __name__ == "__main__":
     model = pretrain(train_instances)
 
     def solve(file):
-        instance = CVRPInstance.from_file(file)
+        # Deliveries are read from the file as they are routed.
+        with CVRPInstanceReader(file) as reader:
+            instance = reader.header
 
-        logger.info("Finetunning on evaluation instance.")
-        model_finetuned = finetune(model, instance)
+            logger.info("Finetunning on evaluation instance.")
+            model_finetuned = finetune(model, instance)
 
-        logger.info("Starting to dynamic route.")
-        for delivery in tqdm(instance.deliveries):
-            model_finetuned = route(model_finetuned, delivery)
+            logger.info("Starting to dynamic route.")
+            for delivery in tqdm(reader):
+                model_finetuned = route(model_finetuned, delivery)
 
         solution = finish(instance, model_finetuned)
 
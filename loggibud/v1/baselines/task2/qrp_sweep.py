@@ -51,6 +51,7 @@ from tqdm import tqdm
 from loggibud.v1.types import (
     Delivery,
     CVRPInstance,
+    CVRPInstanceReader,
     CVRPSolution,
     CVRPSolutionVehicle,
 )
@@ -208,8 +209,7 @@ def route(model: QRPModel, delivery: Delivery) -> QRPModel:
             < model.subinstance.vehicle_capacity
         )
 
-    # TODO: We could make this method faster by using a route size table, but
-    # seems a bit overkill since it's not a bottleneck.
+    # Route occupations are cached, so each check takes constant time.
     feasible_routes = [
         (route_idx, route)
         for route_idx, route in enumerate(subsolution)
@@ -225,7 +225,7 @@ def route(model: QRPModel, delivery: Delivery) -> QRPModel:
         subsolution.append(route)
         route_idx = len(subsolution) - 1
 
-    route.deliveries.append(delivery)
+    route.append(delivery)
     subsolution[route_idx] = route
 
     return model
@@ -309,14 +309,16 @@ if __name__ == "__main__":
     model = pretrain(train_instances)
 
     def solve(file):
-        instance = CVRPInstance.from_file(file)
+        # Deliveries are read from the file as they are routed.
+        with CVRPInstanceReader(file) as reader:
+            instance = reader.header
 
-        logger.info("Finetunning on evaluation instance.")
-        model_finetuned = finetune(model, instance)
+            logger.info("Finetunning on evaluation instance.")
+            model_finetuned = finetune(model, instance)
 
-        logger.info("Starting to dynamic route.")
-        for delivery in tqdm(instance.deliveries):
-            model_finetuned = route(model_finetuned, delivery)
+            logger.info("Starting to dynamic route.")
+            for delivery in tqdm(reader):
+                model_finetuned = route(model_finetuned, delivery)
 
         solution = finish(instance, model_finetuned)
 
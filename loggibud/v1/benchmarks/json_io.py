@@ -0,0 +1,93 @@
+"""Load and save throughput of the JSON instance files
+Compares the generic `dacite` and `dataclasses.asdict` conversions with the
+specialized `from_dict` and `to_dict` of the instance and solution types.
+Whether `orjson` is used for parsing is reported as well.
+
+Example:
+
+    python -m loggibud.v1.benchmarks.json_io \\
+        --instances data/cvrp-instances-1.0/train/rj-0 --limit 50
+"""
+
+import json
+import tempfile
+import time
+from argparse import ArgumentParser
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from dacite import from_dict
+
+from loggibud.v1 import types
+from loggibud.v1.types import (
+    CVRPInstance,
+    dump_json,
+    load_json,
+)
+
+
+def _dacite_load(path: Path) -> CVRPInstance:
+    with open(path) as f:
+        return from_dict(CVRPInstance, json.load(f))
+
+
+def _dacite_save(instance: CVRPInstance, path: Path) -> None:
+    with open(path, "w") as f:
+        json.dump(asdict(instance), f)
+
+
+def _fast_save(instance: CVRPInstance, path: Path) -> None:
+    dump_json(instance.to_dict(), path)
+
+
+def measure_io(
+    files: List[Path],
+    load: Callable[[Path], CVRPInstance],
+    save: Callable[[CVRPInstance, Path], None],
+) -> Dict[str, float]:
+    """Per-instance load and save throughput of a pair of functions"""
+
+    start = time.perf_counter()
+    instances = [load(path) for path in files]
+    load_s = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        start = time.perf_counter()
+        for i, instance in enumerate(instances):
+            save(instance, Path(tmp_dir) / f"{i}.json")
+        save_s = time.perf_counter() - start
+
+    return {
+        "num_instances": len(instances),
+        "load_ms_per_instance": 1_000 * load_s / len(instances),
+        "save_ms_per_instance": 1_000 * save_s / len(instances),
+        "loads_per_s": len(instances) / load_s,
+        "saves_per_s": len(instances) / save_s,
+    }
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser()
+
+    parser.add_argument("--instances", type=str, required=True)
+    parser.add_argument("--limit", type=int)
+
+    args = parser.parse_args()
+
+    path = Path(args.instances)
+    files = [path] if path.is_file() else sorted(path.glob("*.json"))
+    files = files[: args.limit]
+
+    result: Dict[str, Any] = {
+        "orjson": types.orjson is not None,
+        "dacite": measure_io(files, _dacite_load, _dacite_save),
+        "fast": measure_io(
+            files,
+            lambda path: CVRPInstance.from_dict(load_json(path)),
+            _fast_save,
+        ),
+    }
+
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,138 @@
+"""Load generator for the OSRM clients
+Sends route or table requests built from the deliveries of an instance and
+reports the client throughput and latency. If no host is given, a local
+stand-in server (see `loggibud.v1.local_osrm`) is started, so the HTTP path
+can be measured without any map data.
+
+Example:
+
+    python -m loggibud.v1.benchmarks.osrm_load \\
+        --instance tests/test_instances/cvrp-0-rj-0.json \\
+        --mode route --num_routes 500 --max_workers 8 --latency_ms 5
+"""
+
+import json
+import logging
+import time
+from argparse import ArgumentParser
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from loggibud.v1.distances import (
+    calculate_distance_matrix_m,
+    calculate_route_distances_m,
+    OSRMClient,
+    OSRMConfig,
+)
+from loggibud.v1.local_osrm import LocalOSRMServer
+from loggibud.v1.types import CVRPInstance, Point
+
+
+logger = logging.getLogger(__name__)
+
+
+def run_load_test(
+    points: List[Point],
+    config: OSRMConfig,
+    mode: str = "route",
+    num_routes: int = 100,
+    route_size: int = 20,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """Send requests to the configured server and summarize them
+
+    Parameters
+    ----------
+    points
+        Pool of points to build the requests from
+
+    config
+        OSRM configuration, including the number of concurrent requests and
+        the table tiling size
+
+    mode
+        Either "route", sending `num_routes` random routes with `route_size`
+        points each, or "table", requesting the full matrix of `points`
+    """
+    # Matrices are requested through the client shared for this config, so
+    # routes use it as well.
+    client = OSRMClient.for_config(config)
+    rng = np.random.default_rng(seed)
+
+    start = time.perf_counter()
+
+    if mode == "route":
+        routes = [
+            [points[i] for i in rng.choice(len(points), size=route_size)]
+            for _ in range(num_routes)
+        ]
+        calculate_route_distances_m(routes, client=client)
+
+    elif mode == "table":
+        calculate_distance_matrix_m(points, config=config)
+
+    else:
+        raise ValueError(f"Unknown mode {mode}.")
+
+    elapsed_s = time.perf_counter() - start
+    summary = client.summary()
+
+    return dict(
+        mode=mode,
+        elapsed_s=elapsed_s,
+        requests_per_s=summary["num_requests"] / elapsed_s,
+        **summary,
+    )
+
+
+if __name__ == "__main__":
+
+    logging.basicConfig(level=logging.INFO)
+    parser = ArgumentParser()
+
+    parser.add_argument("--instance", type=str, required=True)
+    parser.add_argument("--host", type=str)
+    parser.add_argument("--mode", type=str, default="route")
+    parser.add_argument("--num_routes", type=int, default=100)
+    parser.add_argument("--route_size", type=int, default=20)
+    parser.add_argument("--max_workers", type=int, default=4)
+    parser.add_argument("--max_table_size", type=int)
+    parser.add_argument("--latency_ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args()
+
+    instance = CVRPInstance.from_file(args.instance)
+    points = [instance.origin] + [d.point for d in instance.deliveries]
+
+    server: Optional[LocalOSRMServer] = None
+    if args.host is None:
+        server = LocalOSRMServer(latency_ms=args.latency_ms).start()
+        logger.info(f"Started local OSRM stand-in at {server.url}.")
+
+    config = OSRMConfig(
+        host=args.host or server.url,
+        max_workers=args.max_workers,
+        max_table_size=args.max_table_size,
+    )
+
+    try:
+        result = run_load_test(
+            points,
+            config,
+            mode=args.mode,
+            num_routes=args.num_routes,
+            route_size=args.route_size,
+            seed=args.seed,
+        )
+
+        if server is not None:
+            result["server_connections"] = server.num_connections
+            result["server_requests"] = server.num_requests
+
+    finally:
+        if server is not None:
+            server.stop()
+
+    print(json.dumps(result, indent=2))
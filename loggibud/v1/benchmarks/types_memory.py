@@ -0,0 +1,109 @@
+"""Memory and hashing micro-benchmark of the delivery types
+Compares the slotted `Point` and `Delivery` types with the previous plain
+dataclasses, measuring the memory taken by the deliveries of an instance and
+the time of building the delivery sets used by the evaluation checks.
+
+Example:
+
+    python -m loggibud.v1.benchmarks.types_memory \\
+        --instance tests/test_instances/cvrp-0-rj-0.json --repeat 20
+"""
+
+import json
+import time
+import tracemalloc
+from argparse import ArgumentParser
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+from loggibud.v1.types import Delivery, Point
+
+
+@dataclass(unsafe_hash=True)
+class LegacyPoint:
+    """Previous definition of `Point`, kept for comparison."""
+
+    lng: float
+    lat: float
+
+
+@dataclass(unsafe_hash=True)
+class LegacyDelivery:
+    """Previous definition of `Delivery`, kept for comparison."""
+
+    id: str
+    point: LegacyPoint
+    size: int
+
+
+def measure_types(
+    deliveries_data: List[Dict[str, Any]],
+    point_class: type,
+    delivery_class: type,
+    repeat: int = 10,
+) -> Dict[str, float]:
+    """Memory and set building time of deliveries built from JSON dicts
+
+    Parameters
+    ----------
+    deliveries_data
+        Deliveries as loaded from the instance JSON files
+
+    point_class, delivery_class
+        Types used to build the deliveries
+
+    repeat
+        Number of times the sets are built to measure their time
+    """
+
+    tracemalloc.start()
+    start_bytes, _ = tracemalloc.get_traced_memory()
+
+    deliveries = [
+        delivery_class(
+            id=d["id"],
+            point=point_class(lng=d["point"]["lng"], lat=d["point"]["lat"]),
+            size=d["size"],
+        )
+        for d in deliveries_data
+    ]
+
+    end_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Same operations as the feasibility checks of the evaluation.
+    start = time.perf_counter()
+    for _ in range(repeat):
+        assert set(deliveries) == set(deliveries)
+
+    elapsed_s = (time.perf_counter() - start) / repeat
+
+    return {
+        "num_deliveries": len(deliveries),
+        "bytes_per_delivery": (end_bytes - start_bytes) / len(deliveries),
+        "set_time_ms": 1_000 * elapsed_s,
+    }
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser()
+
+    parser.add_argument("--instance", type=str, required=True)
+    parser.add_argument("--repeat", type=int, default=10)
+
+    args = parser.parse_args()
+
+    with open(args.instance) as f:
+        deliveries_data = json.load(f)["deliveries"]
+
+    result = {
+        "legacy": measure_types(
+            deliveries_data, LegacyPoint, LegacyDelivery, args.repeat
+        ),
+        "slotted": measure_types(
+            deliveries_data, Point, Delivery, args.repeat
+        ),
+    }
+
+    print(json.dumps(result, indent=2))
@@ -1,15 +1,36 @@
 """This module is used to convert the instances to and from known formats
-Currently, only TSPLIB is implemented.
+Currently, TSPLIB and the binary `.npz` dataset format are implemented.
+
+Whole directories of instances and solutions can be converted between the
+JSON and `.npz` formats with
+
+    python -m loggibud.v1.data_conversion \
+        --input data/cvrp-instances-1.0 --output data/cvrp-instances-npz
 """
 
-from typing import Optional
+import logging
+from argparse import ArgumentParser
+from pathlib import Path
+from typing import Any, List, Optional, Type
 from dataclasses import dataclass
 
 import tsplib95
 import numpy as np
+from tqdm import tqdm
+
+from loggibud.v1.distances import get_distance_provider, OSRMConfig
+from loggibud.v1.types import (
+    CVRPInstance,
+    CVRPSolution,
+    CompactCVRPSolution,
+    DeliveryProblemInstance,
+    JSONDataclassMixin,
+    load_json,
+    load_npz,
+)
+
 
-from loggibud.v1.distances import calculate_distance_matrix_m, OSRMConfig
-from loggibud.v1.types import CVRPInstance, JSONDataclassMixin
+logger = logging.getLogger(__name__)
 
 
 @dataclass
@@ -18,6 +39,9 @@ class TSPLIBConversionParams(JSONDataclassMixin):
     osrm_config: Optional[OSRMConfig] = None
     """Config for calling OSRM distance service."""
 
+    distance_provider: Optional[str] = None
+    """Name of the distance provider (see `get_distance_provider`)."""
+
     distance_scaling_factor: int = 10
     """
     Scaling factor for distance matrixes. Scaling is required for solvers that
@@ -45,9 +69,10 @@ def to_tsplib(
         delivery.point for delivery in instance.deliveries
     ]
 
-    distance_matrix = calculate_distance_matrix_m(
-        locations, config=params.osrm_config
+    provider = get_distance_provider(
+        params.distance_provider, params.osrm_config
     )
+    distance_matrix = provider.matrix(locations)
     scaled_matrix = distance_matrix * params.distance_scaling_factor
 
     problem = tsplib95.models.StandardProblem(
@@ -62,3 +87,80 @@ def to_tsplib(
     )
 
     return problem
+
+
+def convert_file(input_path: Path, output_path: Path) -> None:
+    """Convert an instance or solution file to the format of `output_path`
+
+    The type of the data (`CVRPInstance`, `DeliveryProblemInstance`,
+    `CVRPSolution` or `CompactCVRPSolution`) is detected from its fields, and
+    the formats from the file extensions (".json" or ".npz").
+    """
+
+    if input_path.suffix == ".npz":
+        arrays, metadata = load_npz(input_path, mmap=False)
+        data_class = _dataset_class(set(arrays) | set(metadata))
+        data = data_class.from_arrays(arrays, metadata)
+    else:
+        data_dict = load_json(input_path)
+        data = _dataset_class(set(data_dict)).from_dict(data_dict)
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    data.to_file(output_path)
+
+
+def convert_directory(
+    input_dir: Path, output_dir: Path, output_format: str = "npz"
+) -> List[Path]:
+    """Convert all files in a directory tree, keeping its structure."""
+
+    input_format = "json" if output_format == "npz" else "npz"
+    input_paths = sorted(input_dir.rglob(f"*.{input_format}"))
+
+    output_paths = []
+    for input_path in tqdm(input_paths):
+        output_path = (
+            output_dir / input_path.relative_to(input_dir)
+        ).with_suffix(f".{output_format}")
+
+        convert_file(input_path, output_path)
+        output_paths.append(output_path)
+
+    return output_paths
+
+
+def _dataset_class(keys: Any) -> Type[JSONDataclassMixin]:
+    # Compact solutions only store the delivery ids of every route.
+    if "routes" in keys or (
+        "vehicle_offsets" in keys and "coords" not in keys
+    ):
+        return CompactCVRPSolution
+
+    if "vehicles" in keys or "vehicle_offsets" in keys:
+        return CVRPSolution
+
+    if "max_hubs" in keys:
+        return DeliveryProblemInstance
+
+    return CVRPInstance
+
+
+if __name__ == "__main__":
+
+    logging.basicConfig(level=logging.INFO)
+    parser = ArgumentParser()
+
+    parser.add_argument("--input", type=str, required=True)
+    parser.add_argument("--output", type=str, required=True)
+    parser.add_argument("--format", type=str, default="npz")
+
+    args = parser.parse_args()
+
+    input_path = Path(args.input)
+    output_path = Path(args.output)
+
+    if input_path.is_file():
+        convert_file(input_path, output_path)
+    else:
+        output_paths = convert_directory(input_path, output_path, args.format)
+        logger.info(f"Converted {len(output_paths)} files to {output_path}.")
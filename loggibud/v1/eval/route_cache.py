@@ -0,0 +1,183 @@
+"""Route-level cache of distances for repeated evaluations
+Solutions evaluated while tuning a solver, or within local search, share
+most of their routes. `RouteDistanceCache` keys every route by its content
+and only requests the distances of routes it has not seen:
+
+    cache = RouteDistanceCache("osrm")
+    distance_km = cache.evaluate(instance, solution)
+    route_distances_m = cache.route_distances(solution.vehicles)
+
+    # After changing the vehicles 3 and 7 of the solution.
+    route_distances_m = cache.rescore(solution, [3, 7], route_distances_m)
+"""
+
+import hashlib
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Union
+
+import numpy as np
+
+from ..distances import (
+    get_distance_provider,
+    routes_to_paths,
+    DistanceProvider,
+    OSRMConfig,
+)
+from ..types import (
+    CVRPInstance,
+    CVRPSolution,
+    CVRPSolutionVehicle,
+    CompactCVRPSolution,
+    Delivery,
+    Point,
+)
+from .validation import validate_solution
+
+
+def route_key(origin: Point, deliveries: Iterable[Delivery]) -> str:
+    """Hash of the origin and the ordered delivery ids and coordinates."""
+
+    deliveries = list(deliveries)
+    coords = np.array(
+        [(origin.lng, origin.lat)]
+        + [(d.point.lng, d.point.lat) for d in deliveries],
+        dtype=np.float64,
+    )
+
+    digest = hashlib.sha256(coords.tobytes())
+    digest.update("\0".join(d.id for d in deliveries).encode())
+
+    return digest.hexdigest()
+
+
+class RouteDistanceCache:
+    """Distances of vehicle circuits keyed by their content
+
+    Routes are identified by `route_key`, so a route is only requested from
+    the provider the first time it is seen, in any solution. Missing routes
+    are requested together, as in `evaluate_solution`. The cache is kept in
+    memory, evicting the least recently used routes beyond `max_routes`.
+    """
+
+    def __init__(
+        self,
+        distance_provider: Union[str, DistanceProvider] = "osrm",
+        config: Optional[OSRMConfig] = None,
+        max_routes: Optional[int] = None,
+    ):
+        self.provider = get_distance_provider(distance_provider, config)
+        self.max_routes = max_routes
+        self.hits = 0
+        self.misses = 0
+        self._distances: "OrderedDict[str, float]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._distances)
+
+    def route_distances(
+        self, vehicles: List[CVRPSolutionVehicle]
+    ) -> np.ndarray:
+        """Distance (in meters) of every vehicle circuit."""
+
+        keys = [route_key(v.origin, v.deliveries) for v in vehicles]
+        missing = {
+            key: vehicle
+            for key, vehicle in zip(keys, vehicles)
+            if key not in self._distances
+        }
+
+        self.misses += len(missing)
+        self.hits += len(keys) - len(missing)
+
+        if missing:
+            missing_distances = self.provider.path_distances(
+                *routes_to_paths(
+                    [v.origin] + [d.point for d in v.deliveries] + [v.origin]
+                    for v in missing.values()
+                )
+            )
+            self._distances.update(zip(missing, missing_distances.tolist()))
+
+        distances = np.array([self._distances[key] for key in keys])
+
+        for key in keys:
+            self._distances.move_to_end(key)
+
+        while self.max_routes is not None and len(self) > self.max_routes:
+            self._distances.popitem(last=False)
+
+        return distances
+
+    def evaluate(
+        self,
+        instance: CVRPInstance,
+        solution: Union[CVRPSolution, CompactCVRPSolution],
+    ) -> float:
+        """Total distance (in km) of a feasible solution, as returned by
+        `evaluate_solution` with the route mode."""
+
+        validate_solution(instance, solution).raise_if_infeasible()
+
+        if isinstance(solution, CompactCVRPSolution):
+            solution = solution.to_solution(instance)
+
+        route_distances_m = self.route_distances(solution.vehicles)
+
+        # Convert to km.
+        return round(sum(route_distances_m) / 1_000, 4)
+
+    def rescore(
+        self,
+        solution: CVRPSolution,
+        changed_vehicles: Iterable[int],
+        route_distances: np.ndarray,
+    ) -> np.ndarray:
+        """Update the route distances of a solution after some vehicles
+        changed, without checking its feasibility
+
+        Parameters
+        ----------
+        solution
+            Solution after the changes
+
+        changed_vehicles
+            Indices of the vehicles changed, added or removed. Removing a
+            vehicle shifts the following ones, which are then changed as
+            well, so only removals at the end keep the other indices
+
+        route_distances
+            Distance (in meters) of every vehicle before the changes
+
+        Returns
+        -------
+        route_distances
+            Distance (in meters) of every vehicle, only computing those of
+            the changed vehicles (when not in the cache)
+        """
+
+        changed_vehicles = set(changed_vehicles)
+        num_vehicles = len(solution.vehicles)
+
+        distances = np.zeros(num_vehicles)
+        num_kept = min(num_vehicles, len(route_distances))
+        distances[:num_kept] = route_distances[:num_kept]
+
+        # Vehicles added or removed must be listed, which catches removals
+        # in the middle without listing the shifted vehicles.
+        resized = range(num_kept, max(num_vehicles, len(route_distances)))
+        unlisted = set(resized) - changed_vehicles
+        if unlisted:
+            raise ValueError(
+                f"Vehicles {sorted(unlisted)} were added or removed but not "
+                "listed as changed."
+            )
+
+        changed_vehicles = sorted(
+            i for i in changed_vehicles if i < num_vehicles
+        )
+        if changed_vehicles:
+            distances[changed_vehicles] = self.route_distances(
+                [solution.vehicles[i] for i in changed_vehicles]
+            )
+
+        return distances
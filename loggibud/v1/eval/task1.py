@@ -1,75 +1,385 @@
+import csv
+import json
+import os
+import sys
+import time
 from pathlib import Path
 from argparse import ArgumentParser
-from typing import Optional
+from multiprocessing import Pool
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 
-from ..distances import calculate_route_distance_m, OSRMConfig
-from ..types import CVRPInstance, CVRPSolution
+import numpy as np
+from tqdm import tqdm
+
+from ..distances import (
+    calculate_path_distances_matrix_m,
+    get_distance_provider,
+    routes_to_paths,
+    DistanceProvider,
+    EdgeDistanceCache,
+    OSRMConfig,
+)
+from ..types import (
+    CVRPInstance,
+    CVRPSolution,
+    ColumnarCVRPInstance,
+    CompactCVRPSolution,
+    Point,
+    load_solution,
+)
+from .validation import validate_solution
+
+EVALUATION_MODES = ("route", "matrix")
+"""
+Ways of computing route distances:
+- "route": one path request per vehicle (a `/route` call with OSRM);
+- "matrix": a single distance matrix over the origin and all deliveries,
+  from which every route is gathered at once.
+"""
 
 
 def evaluate_solution(
     instance: CVRPInstance,
-    solution: CVRPSolution,
+    solution: Union[CVRPSolution, CompactCVRPSolution],
     config: Optional[OSRMConfig] = None,
+    distance_provider: Union[str, DistanceProvider] = "osrm",
+    mode: str = "route",
 ) -> float:
+    """Total distance (in km) of a feasible solution
 
-    # Check if all demands are present.
-    solution_demands = set(d for v in solution.vehicles for d in v.deliveries)
-    assert solution_demands == set(instance.deliveries)
+    Parameters
+    ----------
+    instance
+        Instance being solved
 
-    # Check if max capacity is respected.
-    max_capacity = max(
-        sum(d.size for d in v.deliveries) for v in solution.vehicles
-    )
-    assert max_capacity <= instance.vehicle_capacity
+    solution
+        Solution to be evaluated. Raises an `AssertionError` if unfeasible.
+        Compact solutions are evaluated directly on their index arrays
 
-    # Check if maximum number of origins is consistent.
-    origins = set([v.origin for v in solution.vehicles])
-    assert len(origins) <= 1
+    config
+        OSRM configuration
 
-    route_distances_m = [
-        calculate_route_distance_m(v.circuit, config=config)
-        for v in solution.vehicles
-    ]
+    distance_provider
+        Provider or provider name used to compute route distances (see
+        `get_distance_provider`). Use "great_circle" to score solutions
+        offline, without calling OSRM
+
+    mode
+        One of `EVALUATION_MODES`. In the "matrix" mode, cached
+        ("cached:osrm") or precomputed ("precomputed:<path>") providers
+        allow scoring without any OSRM request
+    """
+
+    columnar_instance = ColumnarCVRPInstance.from_instance(instance)
+
+    # Check every delivery is served once within capacity from one origin.
+    validate_solution(columnar_instance, solution).raise_if_infeasible()
+
+    route_distances_m = calculate_route_distances(
+        columnar_instance, solution, config, distance_provider, mode
+    )
 
     # Convert to km.
     return round(sum(route_distances_m) / 1_000, 4)
 
 
-if __name__ == "__main__":
-    parser = ArgumentParser()
+def calculate_route_distances(
+    instance: Union[CVRPInstance, ColumnarCVRPInstance],
+    solution: Union[CVRPSolution, CompactCVRPSolution],
+    config: Optional[OSRMConfig] = None,
+    distance_provider: Union[str, DistanceProvider] = "osrm",
+    mode: str = "route",
+) -> np.ndarray:
+    """Distance (in meters) of every vehicle circuit, without checking the
+    solution feasibility
 
-    parser.add_argument("--instances", type=str, required=True)
-    parser.add_argument("--solutions", type=str, required=True)
+    See `evaluate_solution` for the parameters.
+    """
 
-    args = parser.parse_args()
+    if mode not in EVALUATION_MODES:
+        raise ValueError(f"Unknown evaluation mode {mode}.")
 
-    instances_path = Path(args.instances)
-    solutions_path = Path(args.solutions)
+    provider = get_distance_provider(distance_provider, config)
 
-    if instances_path.is_file() and solutions_path.is_file():
-        instances = {"": CVRPInstance.from_file(instances_path)}
-        solutions = {"": CVRPSolution.from_file(solutions_path)}
+    if mode == "route" and isinstance(solution, CVRPSolution):
+        # With OSRM, routes are evaluated concurrently with pooled
+        # connections.
+        return provider.path_distances(
+            *routes_to_paths(v.circuit for v in solution.vehicles)
+        )
 
-    elif instances_path.is_dir() and solutions_path.is_dir():
-        instances = {
-            f.stem: CVRPInstance.from_file(f) for f in instances_path.iterdir()
-        }
-        solutions = {
-            f.stem: CVRPSolution.from_file(f) for f in solutions_path.iterdir()
-        }
+    columnar_instance = (
+        instance
+        if isinstance(instance, ColumnarCVRPInstance)
+        else ColumnarCVRPInstance.from_instance(instance)
+    )
+    if isinstance(solution, CVRPSolution):
+        solution = CompactCVRPSolution.from_solution(solution)
 
-    else:
+    if mode == "route":
+        return provider.path_distances(
+            *solution.circuit_paths(columnar_instance)
+        )
+
+    points = [columnar_instance.origin] + [
+        Point(lng, lat) for lng, lat in columnar_instance.coords.tolist()
+    ]
+    distance_matrix = provider.matrix(points)
+
+    return calculate_path_distances_matrix_m(
+        distance_matrix, *solution.circuit_indices(columnar_instance)
+    )
+
+
+def compare_evaluation_modes(
+    instance: CVRPInstance,
+    solution: Union[CVRPSolution, CompactCVRPSolution],
+    config: Optional[OSRMConfig] = None,
+    distance_provider: Union[str, DistanceProvider] = "osrm",
+) -> Dict[str, float]:
+    """Difference between the "matrix" and "route" evaluation modes
+
+    With OSRM, table and route requests may snap points or pick paths
+    differently, so the totals are not always identical.
+
+    Returns
+    -------
+    comparison
+        Total distances (in km) of both modes, their difference (matrix
+        minus route, in km and relative to the route total) and the largest
+        absolute difference of a single route (in km)
+    """
+
+    columnar_instance = ColumnarCVRPInstance.from_instance(instance)
+    validate_solution(columnar_instance, solution).raise_if_infeasible()
+
+    route_distances_m, matrix_distances_m = (
+        calculate_route_distances(
+            columnar_instance, solution, config, distance_provider, mode
+        )
+        for mode in ("route", "matrix")
+    )
+
+    route_km = route_distances_m.sum() / 1_000
+    matrix_km = matrix_distances_m.sum() / 1_000
+    differences_km = (matrix_distances_m - route_distances_m) / 1_000
+
+    return {
+        "route_km": round(route_km, 4),
+        "matrix_km": round(matrix_km, 4),
+        "difference_km": round(matrix_km - route_km, 4),
+        "relative_difference": (
+            (matrix_km - route_km) / route_km if route_km else 0.0
+        ),
+        "max_route_difference_km": round(
+            float(np.abs(differences_km).max(initial=0.0)), 4
+        ),
+    }
+
+
+def match_solution_files(
+    instances_path: Path, solutions_path: Path
+) -> List[Tuple[str, Path, Path]]:
+    """Pair instance and solution files by name, without loading them."""
+
+    if instances_path.is_file() and solutions_path.is_file():
+        return [(instances_path.stem, instances_path, solutions_path)]
+
+    if not (instances_path.is_dir() and solutions_path.is_dir()):
         raise ValueError("input files do not match, use files or directories.")
 
+    instances = {f.stem: f for f in instances_path.iterdir()}
+    solutions = {f.stem: f for f in solutions_path.iterdir()}
+
     if set(instances) != set(solutions):
         raise ValueError(
             "input files do not match, the solutions and instances should be the same."
         )
 
-    stems = instances.keys()
-
-    results = [
-        evaluate_solution(instances[stem], solutions[stem]) for stem in stems
+    return [
+        (stem, instances[stem], solutions[stem]) for stem in sorted(instances)
     ]
 
-    print(sum(results))
+
+def evaluate_files(
+    pairs: Iterable[Tuple[str, Path, Path]],
+    config: Optional[OSRMConfig] = None,
+    distance_provider: str = "osrm",
+    num_workers: Optional[int] = None,
+    output_path: Optional[Union[Path, str]] = None,
+    mode: str = "route",
+) -> List[Dict[str, Any]]:
+    """Evaluate many solution files in a process pool
+
+    Every worker loads its own pairs of files and reuses a single distance
+    provider (and OSRM connection pool) for all of them. Results are written
+    to `output_path` as they complete, in the CSV or JSONL format according
+    to its extension.
+
+    Parameters
+    ----------
+    pairs
+        Tuples of (name, instance path, solution path), as returned by
+        `match_solution_files`
+
+    num_workers
+        Number of worker processes. If 1, files are evaluated in the current
+        process
+
+    mode
+        Evaluation mode, one of `EVALUATION_MODES`
+
+    Returns
+    -------
+    results
+        One dictionary per pair, in completion order, with the distance (in
+        km), number of vehicles and timings. Infeasible solutions have the
+        error message in "error" and no distance
+    """
+
+    pairs = list(pairs)
+    output_file = open(output_path, "w") if output_path else None
+    writer = None
+
+    if num_workers == 1:
+        _init_worker(config, distance_provider, mode)
+        results_iter = map(_evaluate_pair, pairs)
+        pool = None
+    else:
+        pool = Pool(
+            num_workers,
+            initializer=_init_worker,
+            initargs=(config, distance_provider, mode),
+        )
+        results_iter = pool.imap_unordered(_evaluate_pair, pairs)
+
+    results = []
+
+    try:
+        for result in tqdm(results_iter, total=len(pairs)):
+            results.append(result)
+
+            if output_file is None:
+                continue
+
+            if Path(output_path).suffix == ".csv":
+                if writer is None:
+                    writer = csv.DictWriter(output_file, list(result))
+                    writer.writeheader()
+
+                writer.writerow(result)
+            else:
+                output_file.write(json.dumps(result) + "\n")
+
+            output_file.flush()
+
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+        if output_file is not None:
+            output_file.close()
+
+    return results
+
+
+# Distance provider shared by all evaluations of a worker process.
+_worker_provider: Optional[DistanceProvider] = None
+_worker_config: Optional[OSRMConfig] = None
+_worker_mode = "route"
+
+
+def _init_worker(
+    config: Optional[OSRMConfig], distance_provider: str, mode: str
+) -> None:
+    global _worker_provider, _worker_config, _worker_mode
+
+    _worker_config = config
+    _worker_mode = mode
+    _worker_provider = get_distance_provider(distance_provider, config)
+
+
+def _evaluate_pair(pair: Tuple[str, Path, Path]) -> Dict[str, Any]:
+    name, instance_path, solution_path = pair
+    result = {
+        "name": name,
+        "distance_km": None,
+        "num_vehicles": None,
+        "num_deliveries": None,
+        "load_s": None,
+        "eval_s": None,
+        "error": None,
+    }
+
+    # Any failure is reported in the result, so a single broken file does not
+    # stop the evaluation of the others.
+    try:
+        start = time.perf_counter()
+        instance = CVRPInstance.from_file(instance_path)
+        solution = load_solution(solution_path)
+        result["load_s"] = round(time.perf_counter() - start, 6)
+
+        if isinstance(solution, CompactCVRPSolution):
+            result["num_vehicles"] = len(solution.routes)
+        else:
+            result["num_vehicles"] = len(solution.vehicles)
+
+        result["num_deliveries"] = len(instance.deliveries)
+
+        start = time.perf_counter()
+        try:
+            result["distance_km"] = evaluate_solution(
+                instance,
+                solution,
+                config=_worker_config,
+                distance_provider=_worker_provider,
+                mode=_worker_mode,
+            )
+        finally:
+            result["eval_s"] = round(time.perf_counter() - start, 6)
+
+    except AssertionError as e:
+        result["error"] = str(e) or "infeasible solution"
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+
+    return result
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+
+    parser.add_argument("--instances", type=str, required=True)
+    parser.add_argument("--solutions", type=str, required=True)
+    parser.add_argument("--distance_provider", type=str, default="osrm")
+    parser.add_argument("--edge_cache_path", type=str)
+    parser.add_argument("--num_workers", type=int, default=os.cpu_count())
+    parser.add_argument("--output", type=str)
+    parser.add_argument(
+        "--mode", type=str, default="route", choices=EVALUATION_MODES
+    )
+
+    args = parser.parse_args()
+
+    pairs = match_solution_files(Path(args.instances), Path(args.solutions))
+    config = OSRMConfig(edge_cache_path=args.edge_cache_path)
+
+    results = evaluate_files(
+        pairs,
+        config=config,
+        distance_provider=args.distance_provider,
+        num_workers=args.num_workers,
+        output_path=args.output,
+        mode=args.mode,
+    )
+
+    print(sum(r["distance_km"] for r in results if r["error"] is None))
+
+    if args.edge_cache_path:
+        stats = EdgeDistanceCache.for_path(args.edge_cache_path).stats()
+        print(f"Edge cache: {stats}", file=sys.stderr)
+
+    failed = [r["name"] for r in results if r["error"] is not None]
+    if failed:
+        sys.exit(f"{len(failed)} solutions failed: {', '.join(failed)}")
@@ -0,0 +1,326 @@
+"""Evaluation of task 2 (online routing) solvers
+Deliveries of an instance are replayed one at a time through the solver
+`finetune`, `route` and `finish` functions, as in production, measuring the
+latency of every `route` call and the time spent in `finish`. The harness
+also checks routing is irreversible: once routed, a delivery must stay in
+its vehicle, and `finish` may only reorder the deliveries within vehicles.
+
+Example:
+
+    python -m loggibud.v1.eval.task2 --solver kmeans_greedy \\
+        --train_instances data/cvrp-instances-1.0/train/rj-0 \\
+        --eval_instances data/cvrp-instances-1.0/dev/rj-0 \\
+        --distance_provider great_circle --output results.jsonl
+"""
+
+import csv
+import importlib
+import json
+import logging
+import time
+import tracemalloc
+from argparse import ArgumentParser
+from collections import Counter
+from dataclasses import replace
+from pathlib import Path
+from types import ModuleType
+from typing import (
+    Any,
+    Dict,
+    Hashable,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import numpy as np
+from tqdm import tqdm
+
+from ..distances import DistanceProvider, OSRMConfig
+from ..types import CVRPInstance, CVRPSolution, Delivery
+from .task1 import evaluate_solution
+
+logger = logging.getLogger(__name__)
+
+
+def get_solver(solver: Union[str, ModuleType]) -> ModuleType:
+    """Module of a task 2 solver, given as a module or the name of a
+    baseline in `loggibud.v1.baselines.task2`."""
+
+    if isinstance(solver, ModuleType):
+        return solver
+
+    return importlib.import_module(f"loggibud.v1.baselines.task2.{solver}")
+
+
+def replay_instance(
+    solver: Union[str, ModuleType],
+    model: Any,
+    instance: CVRPInstance,
+    check_irreversible: bool = True,
+    trace_memory: bool = True,
+) -> Tuple[CVRPSolution, Dict[str, Any]]:
+    """Solve an instance routing one delivery at a time
+
+    Parameters
+    ----------
+    solver
+        Module (or baseline name) with the `finetune(model, instance)`,
+        `route(model, delivery)` and `finish(instance, model)` functions.
+        `finetune` and `finish` receive the instance without its deliveries,
+        so the solver only knows the deliveries routed so far
+
+    model
+        Pretrained solver model
+
+    check_irreversible
+        Raise an `AssertionError` if a routed delivery changes its vehicle.
+        Requires the model to keep its vehicles in `cluster_subsolutions`,
+        as the baselines do. Checks are not included in the timings
+
+    trace_memory
+        Measure the peak memory allocated by Python with `tracemalloc`. The
+        tracing slows down memory allocations, inflating the timings
+
+    Returns
+    -------
+    solution, metrics
+        Final solution and a dictionary with the latency percentiles of the
+        `route` calls (in ms), the time spent in `finetune` and `finish` (in
+        seconds) and the peak memory (in MB)
+    """
+
+    solver = get_solver(solver)
+    header = replace(instance, deliveries=[])
+
+    if trace_memory:
+        tracemalloc.start()
+
+    try:
+        start = time.perf_counter()
+        model = solver.finetune(model, header)
+        finetune_s = time.perf_counter() - start
+
+        lengths = _vehicle_lengths(model) if check_irreversible else None
+        assignments: "Counter[Tuple[str, Hashable]]" = Counter()
+        latencies_s = np.zeros(len(instance.deliveries))
+
+        for i, delivery in enumerate(instance.deliveries):
+            start = time.perf_counter()
+            model = solver.route(model, delivery)
+            latencies_s[i] = time.perf_counter() - start
+
+            if check_irreversible:
+                lengths, vehicle = _check_routed(model, delivery, lengths)
+                assignments[delivery.id, vehicle] += 1
+
+        if check_irreversible:
+            assert assignments == _assignments(
+                model
+            ), "Deliveries were moved between vehicles."
+
+            routes = _route_id_sets(
+                v.deliveries
+                for subsolution in model.cluster_subsolutions.values()
+                for v in subsolution
+            )
+
+        start = time.perf_counter()
+        solution = solver.finish(header, model)
+        finish_s = time.perf_counter() - start
+
+        peak_memory_mb = (
+            tracemalloc.get_traced_memory()[1] / 2 ** 20
+            if trace_memory
+            else None
+        )
+
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+
+    if check_irreversible and routes != _route_id_sets(
+        v.deliveries for v in solution.vehicles
+    ):
+        raise AssertionError("Vehicles were changed in finish.")
+
+    latencies_ms = 1_000 * latencies_s
+    p50, p95, p99 = (
+        np.percentile(latencies_ms, [50, 95, 99]).tolist()
+        if len(latencies_ms)
+        else (0.0, 0.0, 0.0)
+    )
+
+    return solution, {
+        "num_deliveries": len(instance.deliveries),
+        "num_vehicles": len(solution.vehicles),
+        "finetune_s": round(finetune_s, 6),
+        "route_p50_ms": round(p50, 4),
+        "route_p95_ms": round(p95, 4),
+        "route_p99_ms": round(p99, 4),
+        "route_max_ms": round(float(latencies_ms.max(initial=0.0)), 4),
+        "route_total_s": round(float(latencies_s.sum()), 6),
+        "finish_s": round(finish_s, 6),
+        "peak_memory_mb": (
+            None if peak_memory_mb is None else round(peak_memory_mb, 3)
+        ),
+    }
+
+
+def evaluate_instance(
+    solver: Union[str, ModuleType],
+    model: Any,
+    instance: CVRPInstance,
+    config: Optional[OSRMConfig] = None,
+    distance_provider: Union[str, DistanceProvider] = "osrm",
+    **kwargs,
+) -> Dict[str, Any]:
+    """Replay an instance (see `replay_instance`) and evaluate its solution
+
+    Returns
+    -------
+    result
+        Timings and memory of the replay, with the instance name and the
+        total distance (in km) of the solution. Infeasible or reversed
+        routing has the error message in "error" and no distance
+    """
+
+    try:
+        solution, metrics = replay_instance(solver, model, instance, **kwargs)
+        distance_km = evaluate_solution(
+            instance,
+            solution,
+            config=config,
+            distance_provider=distance_provider,
+        )
+        error = None
+    except AssertionError as e:
+        metrics = {}
+        distance_km = None
+        error = str(e) or "infeasible solution"
+
+    return {
+        "name": instance.name,
+        "distance_km": distance_km,
+        **metrics,
+        "error": error,
+    }
+
+
+def _vehicle_lengths(model: Any) -> Dict[Hashable, int]:
+    """Number of deliveries of every vehicle in the model"""
+
+    if getattr(model, "cluster_subsolutions", None) is None:
+        raise ValueError(
+            "Checking irreversibility requires `cluster_subsolutions`."
+        )
+
+    return {
+        (cluster, id(vehicle)): len(vehicle.deliveries)
+        for cluster, subsolution in model.cluster_subsolutions.items()
+        for vehicle in subsolution
+    }
+
+
+def _assignments(model: Any) -> "Counter[Tuple[str, Hashable]]":
+    """Pairs of delivery id and vehicle of the model"""
+
+    return Counter(
+        (delivery.id, (cluster, id(vehicle)))
+        for cluster, subsolution in model.cluster_subsolutions.items()
+        for vehicle in subsolution
+        for delivery in vehicle.deliveries
+    )
+
+
+def _check_routed(
+    model: Any, delivery: Delivery, lengths: Dict[Hashable, int]
+) -> Tuple[Dict[Hashable, int], Hashable]:
+    """Ensure routing a delivery only added it to a single vehicle, and
+    return the new vehicle lengths and that vehicle"""
+
+    new_lengths = _vehicle_lengths(model)
+    grown = [
+        key
+        for key, length in new_lengths.items()
+        if length != lengths.get(key, 0)
+    ]
+
+    assert len(grown) == 1 and new_lengths[grown[0]] == (
+        lengths.get(grown[0], 0) + 1
+    ), f"Routing delivery {delivery.id} changed other vehicles."
+
+    assert set(lengths) <= set(
+        new_lengths
+    ), f"Routing delivery {delivery.id} removed a vehicle."
+
+    return new_lengths, grown[0]
+
+
+def _route_id_sets(
+    routes: Iterable[List[Delivery]],
+) -> List[Tuple[str, ...]]:
+    """Sorted delivery ids of every non-empty route, in a canonical order"""
+
+    return sorted(
+        tuple(sorted(d.id for d in deliveries))
+        for deliveries in routes
+        if deliveries
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = ArgumentParser()
+
+    parser.add_argument("--solver", type=str, default="kmeans_greedy")
+    parser.add_argument("--train_instances", type=str, required=True)
+    parser.add_argument("--eval_instances", type=str, required=True)
+    parser.add_argument("--distance_provider", type=str, default="osrm")
+    parser.add_argument("--output", type=str)
+    parser.add_argument("--no_trace_memory", action="store_true")
+
+    args = parser.parse_args()
+
+    solver = get_solver(args.solver)
+
+    train_path = Path(args.train_instances)
+    train_files = (
+        [train_path] if train_path.is_file() else sorted(train_path.iterdir())
+    )
+    eval_path = Path(args.eval_instances)
+    eval_files = (
+        [eval_path] if eval_path.is_file() else sorted(eval_path.iterdir())
+    )
+
+    logger.info("Pretraining on training instances.")
+    model = solver.pretrain([CVRPInstance.from_file(f) for f in train_files])
+
+    # Instances are replayed sequentially, so latencies are not affected by
+    # other solvers running concurrently.
+    results = [
+        evaluate_instance(
+            solver,
+            model,
+            CVRPInstance.from_file(f),
+            distance_provider=args.distance_provider,
+            trace_memory=not args.no_trace_memory,
+        )
+        for f in tqdm(eval_files)
+    ]
+
+    if args.output and Path(args.output).suffix == ".csv":
+        with open(args.output, "w") as f:
+            fieldnames = list({k: None for r in results for k in r})
+            writer = csv.DictWriter(f, fieldnames)
+            writer.writeheader()
+            writer.writerows(results)
+
+    elif args.output:
+        with open(args.output, "w") as f:
+            f.writelines(json.dumps(r) + "\n" for r in results)
+
+    for result in results:
+        print(json.dumps(result))
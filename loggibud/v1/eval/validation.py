@@ -0,0 +1,228 @@
+"""Feasibility validation of CVRP solutions
+All checks work on arrays of delivery ids and sizes, so validating solutions
+with tens of thousands of deliveries takes milliseconds, and every violation
+is reported instead of stopping at the first one. It runs before any
+distance is computed in `loggibud.v1.eval.task1.evaluate_solution`.
+"""
+
+from dataclasses import dataclass, field
+from typing import List, Optional, Union
+
+import numpy as np
+
+from ..types import (
+    CVRPInstance,
+    CVRPSolution,
+    ColumnarCVRPInstance,
+    CompactCVRPSolution,
+)
+
+# Maximum number of delivery ids listed in every violation.
+MAX_REPORTED_IDS = 10
+
+
+@dataclass
+class Violation:
+    """A broken feasibility constraint."""
+
+    kind: str
+    """
+    One of "missing", "duplicate", "unknown" (ids not in the instance),
+    "mismatch" (deliveries differing from the instance), "capacity" and
+    "origin".
+    """
+
+    message: str
+    """Human readable description."""
+
+    vehicle: Optional[int] = None
+    """Index of the vehicle, for route constraints."""
+
+    delivery_ids: List[str] = field(default_factory=list)
+    """Some of the offending delivery ids (up to `MAX_REPORTED_IDS`)."""
+
+
+@dataclass
+class ValidationReport:
+    """Result of validating a solution against its instance."""
+
+    num_deliveries: int
+    """Number of deliveries in the solution."""
+
+    num_vehicles: int
+    """Number of vehicles in the solution."""
+
+    violations: List[Violation] = field(default_factory=list)
+    """Every violated constraint."""
+
+    @property
+    def is_feasible(self) -> bool:
+        return not self.violations
+
+    def summary(self) -> str:
+        if self.is_feasible:
+            return "Feasible solution."
+
+        return "\n".join(
+            [f"{len(self.violations)} violations:"]
+            + [f"- {violation.message}" for violation in self.violations]
+        )
+
+    def raise_if_infeasible(self) -> None:
+        """Raise an `AssertionError` listing all violations, if any."""
+
+        if not self.is_feasible:
+            raise AssertionError(self.summary())
+
+
+def validate_solution(
+    instance: Union[CVRPInstance, ColumnarCVRPInstance],
+    solution: Union[CVRPSolution, CompactCVRPSolution],
+) -> ValidationReport:
+    """Check that a solution serves every delivery exactly once within the
+    vehicle capacity and from a single origin
+
+    Parameters
+    ----------
+    instance
+        Instance being solved
+
+    solution
+        Solution in the regular or compact format. Deliveries of regular
+        solutions must also match the instance ones (point and size)
+
+    Returns
+    -------
+    report
+        Every violation found
+    """
+
+    if not isinstance(instance, ColumnarCVRPInstance):
+        instance = ColumnarCVRPInstance.from_instance(instance)
+
+    if isinstance(solution, CompactCVRPSolution):
+        route_ids = np.char.encode(
+            np.array([i for route in solution.routes for i in route], str),
+            "utf-8",
+        ).astype(bytes)
+        route_lengths = [len(route) for route in solution.routes]
+        route_deliveries = None
+        origins = {instance.origin}
+    else:
+        route_deliveries = ColumnarCVRPInstance.from_deliveries(
+            "",
+            "",
+            instance.origin,
+            0,
+            [d for v in solution.vehicles for d in v.deliveries],
+        )
+        route_ids = route_deliveries.ids
+        route_lengths = [len(v.deliveries) for v in solution.vehicles]
+        origins = set(v.origin for v in solution.vehicles)
+
+    report = ValidationReport(
+        num_deliveries=len(route_ids), num_vehicles=len(route_lengths)
+    )
+    vehicle_offsets = np.cumsum([0] + route_lengths, dtype=np.int64)
+
+    # Locate every route delivery in the instance by the sorted ids.
+    order = np.argsort(instance.ids, kind="stable")
+    sorted_ids = instance.ids[order]
+    positions = np.searchsorted(sorted_ids, route_ids)
+    positions = positions.clip(max=max(len(sorted_ids) - 1, 0))
+
+    if len(sorted_ids):
+        known = sorted_ids[positions] == route_ids
+    else:
+        known = np.zeros(len(route_ids), dtype=bool)
+
+    _report_ids(report, "unknown", route_ids[~known], "not in the instance")
+
+    # Compare how many times every id appears in the instance and solution.
+    # Deliveries repeated in the instance may be served once or repeatedly,
+    # as long as not more often than listed.
+    unique_ids, instance_counts = np.unique(sorted_ids, return_counts=True)
+    solution_counts = np.bincount(
+        np.searchsorted(unique_ids, route_ids[known]),
+        minlength=len(unique_ids),
+    )
+
+    _report_ids(
+        report,
+        "missing",
+        unique_ids[solution_counts == 0],
+        "not served",
+    )
+    _report_ids(
+        report,
+        "duplicate",
+        unique_ids[solution_counts > instance_counts],
+        "served more than once",
+    )
+
+    instance_indices = order[positions]
+
+    if route_deliveries is not None:
+        mismatch = known & (
+            (route_deliveries.size != instance.size[instance_indices])
+            | np.any(
+                route_deliveries.coords != instance.coords[instance_indices],
+                axis=1,
+            )
+        )
+        _report_ids(
+            report,
+            "mismatch",
+            route_ids[mismatch],
+            "differ from the instance",
+        )
+        sizes = route_deliveries.size
+    else:
+        sizes = np.where(known, instance.size[instance_indices], 0)
+
+    # Sum the sizes of every route. Empty routes are skipped, as reduceat
+    # does not support empty segments.
+    occupations = np.zeros(len(route_lengths), dtype=np.int64)
+    non_empty = np.diff(vehicle_offsets) > 0
+    if non_empty.any():
+        occupations[non_empty] = np.add.reduceat(
+            sizes, vehicle_offsets[:-1][non_empty]
+        )
+
+    for vehicle in np.flatnonzero(occupations > instance.vehicle_capacity):
+        report.violations.append(
+            Violation(
+                kind="capacity",
+                message=(
+                    f"Vehicle {vehicle} carries {occupations[vehicle]}, "
+                    f"above the capacity of {instance.vehicle_capacity}."
+                ),
+                vehicle=int(vehicle),
+            )
+        )
+
+    if len(origins) > 1:
+        report.violations.append(
+            Violation(
+                kind="origin",
+                message=f"Vehicles leave from {len(origins)} origins.",
+            )
+        )
+
+    return report
+
+
+def _report_ids(
+    report: ValidationReport, kind: str, ids: np.ndarray, description: str
+) -> None:
+    if not len(ids):
+        return
+
+    listed = np.char.decode(ids[:MAX_REPORTED_IDS], "utf-8").tolist()
+    report.violations.append(
+        Violation(
+            kind=kind,
+            message=f"{len(ids)} deliveries {description}: {listed}.",
+            delivery_ids=listed,
+        )
+    )
@@ -0,0 +1,270 @@
+"""Local stand-in for an OSRM server
+Implements the `/table` and `/route` services used in this package, answering
+with Great Circle distances scaled by a detour factor. It does not require any
+map data, so it can be used to test and benchmark the HTTP clients (connection
+reuse, tiling, concurrency) on any machine. Distances are NOT street
+distances, so never use it to evaluate solutions.
+
+Run it with
+
+    python -m loggibud.v1.local_osrm --port 5000 --latency_ms 5
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from argparse import ArgumentParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+import numpy as np
+import polyline
+
+from loggibud.v1.distances import calculate_distance_matrix_great_circle_m
+from loggibud.v1.types import Point
+
+
+logger = logging.getLogger(__name__)
+
+
+class LocalOSRMServer:
+    """Threaded HTTP server mimicking the OSRM `/table` and `/route` APIs
+
+    Parameters
+    ----------
+    host, port
+        Address to listen on. Use port 0 to pick any free port
+
+    detour_factor
+        Ratio between the returned distances and the Great Circle ones
+
+    latency_ms
+        Artificial delay added to every request
+
+    max_table_size
+        If provided, requests with more coordinates fail with "TooBig", as
+        the `--max-table-size` option of the real server
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        detour_factor: float = 1.3,
+        latency_ms: float = 0.0,
+        max_table_size: Optional[int] = None,
+    ):
+        self.detour_factor = detour_factor
+        self.latency_ms = latency_ms
+        self.max_table_size = max_table_size
+
+        self.num_connections = 0
+        self.num_requests = 0
+        self._stats_lock = threading.Lock()
+
+        self.httpd = ThreadingHTTPServer((host, port), _OSRMRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.osrm = self
+
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "LocalOSRMServer":
+        """Serve requests in a background thread."""
+
+        self._thread = threading.Thread(
+            target=self.httpd.serve_forever, daemon=True
+        )
+        self._thread.start()
+
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "LocalOSRMServer":
+        return self.start()
+
+    def __exit__(self, *args: Any) -> None:
+        self.stop()
+
+    def handle(self, path: str) -> Tuple[int, Dict[str, Any]]:
+        """Answer a request path with its status code and JSON body."""
+
+        with self._stats_lock:
+            self.num_requests += 1
+
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1_000)
+
+        try:
+            service, points, params = _parse_path(path)
+        except (ValueError, IndexError):
+            return 400, {"code": "InvalidUrl", "message": f"Bad URL {path}"}
+
+        if self.max_table_size and len(points) > self.max_table_size:
+            return 400, {"code": "TooBig", "message": "Too many coordinates"}
+
+        if service == "table":
+            return 200, self._table(points, params)
+
+        if service == "route":
+            return 200, self._route(points, params)
+
+        return 400, {"code": "InvalidService", "message": service}
+
+    def _table(
+        self, points: List[Point], params: Dict[str, str]
+    ) -> Dict[str, Any]:
+        all_indices = list(range(len(points)))
+        sources = _parse_indices(params.get("sources"), all_indices)
+        destinations = _parse_indices(params.get("destinations"), all_indices)
+
+        distance_matrix = self.detour_factor * (
+            calculate_distance_matrix_great_circle_m(points)
+        )
+
+        return {
+            "code": "Ok",
+            "distances": distance_matrix[np.ix_(sources, destinations)]
+            .round(1)
+            .tolist(),
+            "sources": [_waypoint(points[i]) for i in sources],
+            "destinations": [_waypoint(points[i]) for i in destinations],
+        }
+
+    def _route(
+        self, points: List[Point], params: Dict[str, str]
+    ) -> Dict[str, Any]:
+        distance_matrix = self.detour_factor * (
+            calculate_distance_matrix_great_circle_m(points)
+        )
+        leg_distances = np.diag(distance_matrix, k=1).round(1)
+
+        route = {
+            "distance": float(leg_distances.sum()),
+            "legs": [{"distance": float(d)} for d in leg_distances],
+        }
+
+        if params.get("overview") != "false":
+            route["geometry"] = polyline.encode(
+                [(p.lat, p.lng) for p in points], 5
+            )
+
+        return {
+            "code": "Ok",
+            "routes": [route],
+            "waypoints": [_waypoint(point) for point in points],
+        }
+
+
+class _OSRMRequestHandler(BaseHTTPRequestHandler):
+    # Keep connections alive, as the real server.
+    protocol_version = "HTTP/1.1"
+
+    def setup(self) -> None:
+        super().setup()
+
+        with self.server.osrm._stats_lock:
+            self.server.osrm.num_connections += 1
+
+    def do_GET(self) -> None:
+        status, data = self.server.osrm.handle(self.path)
+        body = json.dumps(data).encode()
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug(format, *args)
+
+
+def _parse_path(path: str) -> Tuple[str, List[Point], Dict[str, str]]:
+    """Split "/{service}/v1/{profile}/{coordinates}?{params}" """
+
+    url = urlsplit(path)
+    _, service, _, _, coords_uri = url.path.split("/", 4)
+    coords_uri = unquote(coords_uri)
+
+    # Parameters are separated by "&", while ";" separates list values.
+    params = dict(
+        (key, unquote(value))
+        for key, _, value in (p.partition("=") for p in url.query.split("&"))
+        if key
+    )
+
+    if coords_uri.startswith("polyline6("):
+        coords = polyline.decode(coords_uri[len("polyline6(") : -1], 6)
+        points = [Point(lng, lat) for lat, lng in coords]
+
+    elif coords_uri.startswith("polyline("):
+        coords = polyline.decode(coords_uri[len("polyline(") : -1], 5)
+        points = [Point(lng, lat) for lat, lng in coords]
+
+    else:
+        points = [
+            Point(*map(float, coords.split(",")))
+            for coords in coords_uri.split(";")
+        ]
+
+    return service, points, params
+
+
+def _parse_indices(value: Optional[str], default: List[int]) -> List[int]:
+    if value is None or value == "all":
+        return default
+
+    return [int(i) for i in value.split(";")]
+
+
+def _waypoint(point: Point) -> Dict[str, Any]:
+    hint = hashlib.sha1(f"{point.lng},{point.lat}".encode()).hexdigest()
+
+    return {
+        "hint": hint,
+        "location": [point.lng, point.lat],
+        "distance": 0.0,
+        "name": "",
+    }
+
+
+if __name__ == "__main__":
+
+    logging.basicConfig(level=logging.INFO)
+    parser = ArgumentParser()
+
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--detour_factor", type=float, default=1.3)
+    parser.add_argument("--latency_ms", type=float, default=0.0)
+    parser.add_argument("--max_table_size", type=int)
+
+    args = parser.parse_args()
+
+    server = LocalOSRMServer(
+        host=args.host,
+        port=args.port,
+        detour_factor=args.detour_factor,
+        latency_ms=args.latency_ms,
+        max_table_size=args.max_table_size,
+    )
+
+    logger.info(f"Serving local OSRM stand-in at {server.url}.")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.httpd.server_close()
@@ -1,13 +1,17 @@
 """Plots solution routes"""
-from typing import List, Iterable, Optional
+from typing import List, Iterable, Optional, Union
 
 import folium
 import numpy as np
 import polyline
-import requests
 
-from loggibud.v1.types import CVRPSolution, Point
-from loggibud.v1.distances import OSRMConfig
+from loggibud.v1.types import (
+    CVRPInstance,
+    CVRPSolution,
+    CompactCVRPSolution,
+    Point,
+)
+from loggibud.v1.distances import OSRMClient, OSRMConfig
 
 
 # All available map colors
@@ -31,9 +35,10 @@ MAP_COLORS = (
 
 
 def plot_cvrp_solution_routes(
-    solution: CVRPSolution,
+    solution: Union[CVRPSolution, CompactCVRPSolution],
     route_indices_to_plot: Optional[List[int]] = None,
     config: Optional[OSRMConfig] = None,
+    instance: Optional[CVRPInstance] = None,
 ) -> None:
     """Plot solution routes in a map along the streets
 
@@ -49,8 +54,12 @@ def plot_cvrp_solution_routes(
 
     config
         OSRM configuration
+
+    instance
+        Solved instance, only required for compact solutions
     """
     config = config or OSRMConfig()
+    solution = _resolve_solution(solution, instance)
 
     # Initialize map centered at the mean of the origins
     origins_mean = np.mean(
@@ -99,21 +108,18 @@ def plot_cvrp_solution_routes(
 
 
 def _route_wiring(points: Iterable[Point], config):
-    coords_uri = ";".join(f"{point.lng},{point.lat}" for point in points)
-
-    response = requests.get(
-        f"{config.host}/route/v1/driving/{coords_uri}?overview=simplified",
-        timeout=config.timeout_s,
-    )
+    client = OSRMClient.for_config(config)
 
-    data = response.json()
+    data = client.request("route", points, "overview=simplified")
     line = data["routes"][0]["geometry"]
 
     return [(lat, lng) for lat, lng in polyline.decode(line)]
 
 
 def plot_cvrp_solution(
-    solution: CVRPSolution, route_indices_to_plot: Optional[List[int]] = None
+    solution: Union[CVRPSolution, CompactCVRPSolution],
+    route_indices_to_plot: Optional[List[int]] = None,
+    instance: Optional[CVRPInstance] = None,
 ) -> None:
     """Plot solution deliveries in a map
     This is a simplified version showing only the edges between each delivery.
@@ -128,7 +134,12 @@ def plot_cvrp_solution(
         If specified, selects a smaller subset of routes to plot by their
         indices. This can be useful to reduce the clutter in case of a
         solution with too many vehicles
+
+    instance
+        Solved instance, only required for compact solutions
     """
+    solution = _resolve_solution(solution, instance)
+
     # Initialize map centered at the mean of the origins
     origins_mean = np.mean(
         [
@@ -161,3 +172,16 @@ def plot_cvrp_solution(
         ).add_to(m)
 
     return m
+
+
+def _resolve_solution(
+    solution: Union[CVRPSolution, CompactCVRPSolution],
+    instance: Optional[CVRPInstance],
+) -> CVRPSolution:
+    if not isinstance(solution, CompactCVRPSolution):
+        return solution
+
+    if instance is None:
+        raise ValueError("Plotting compact solutions requires the instance.")
+
+    return solution.to_solution(instance)
@@ -1,47 +1,236 @@
 import json
+import re
+import struct
+import zipfile
+from collections.abc import Sequence
 from dataclasses import dataclass, asdict
 from pathlib import Path
-from typing import List, Union
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
+import numpy as np
 from dacite import from_dict
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 class JSONDataclassMixin:
-    """Mixin for adding JSON file capabilities to Python dataclasses."""
+    """Mixin for adding JSON file capabilities to Python dataclasses.
+
+    Files are read and written with `orjson` when it is installed. Subclasses
+    may override `from_dict` and `to_dict` with faster specialized versions.
+
+    Paths with the `.npz` extension use a binary format instead (see
+    `save_npz`), where subclasses may store their bulk data as arrays by
+    overriding `from_arrays` and `to_arrays`.
+    """
 
     @classmethod
     def from_file(cls, path: Union[Path, str]) -> "JSONDataclassMixin":
         """Load dataclass instance from provided file path."""
 
-        with open(path) as f:
-            data = json.load(f)
+        if Path(path).suffix == ".npz":
+            return cls.from_arrays(*load_npz(path))
 
-        return from_dict(cls, data)
+        return cls.from_dict(load_json(path))
 
     def to_file(self, path: Union[Path, str]) -> None:
         """Save dataclass instance to provided file path."""
 
-        with open(path, "w") as f:
-            json.dump(asdict(self), f)
+        if Path(path).suffix == ".npz":
+            save_npz(path, *self.to_arrays())
+        else:
+            dump_json(self.to_dict(), path)
 
         return
 
+    @classmethod
+    def from_arrays(
+        cls, arrays: Dict[str, np.ndarray], metadata: Dict[str, Any]
+    ) -> "JSONDataclassMixin":
+        """Build dataclass instance from the binary format data."""
+
+        return cls.from_dict(metadata)
+
+    def to_arrays(self) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        """Split dataclass instance into arrays and JSON metadata.
+
+        By default, everything is stored in the metadata.
+        """
+
+        return {}, self.to_dict()
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "JSONDataclassMixin":
+        """Build dataclass instance from parsed JSON data."""
+
+        return from_dict(cls, data)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert dataclass instance to JSON serializable data."""
+
+        return asdict(self)
+
+
+def load_json(path: Union[Path, str]) -> Any:
+    """Parse a JSON file, using `orjson` if available."""
+
+    if orjson is not None:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+
+    with open(path) as f:
+        return json.load(f)
+
+
+def dump_json(data: Any, path: Union[Path, str]) -> None:
+    """Write data to a JSON file, using `orjson` if available.
+
+    Numpy scalars and arrays, as produced by the instance generators, are
+    written as regular numbers and lists.
+    """
+
+    if orjson is not None:
+        with open(path, "wb") as f:
+            f.write(
+                orjson.dumps(
+                    data,
+                    default=_json_default,
+                    option=orjson.OPT_SERIALIZE_NUMPY,
+                )
+            )
+
+        return
+
+    with open(path, "w") as f:
+        json.dump(data, f, default=_json_default)
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (np.generic, np.ndarray)):
+        return value.tolist()
+
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def save_npz(
+    path: Union[Path, str],
+    arrays: Dict[str, np.ndarray],
+    metadata: Dict[str, Any],
+) -> None:
+    """Write arrays and JSON metadata to an uncompressed `.npz` file
+
+    The metadata is stored as the UTF-8 bytes of its JSON in the `metadata`
+    member. Members are not compressed, so they can be memory-mapped when
+    loading (see `load_npz`).
+    """
+
+    metadata_bytes = np.frombuffer(json.dumps(metadata).encode(), np.uint8)
+
+    with open(path, "wb") as f:
+        np.savez(f, metadata=metadata_bytes, **arrays)
+
+
+def load_npz(
+    path: Union[Path, str], mmap: bool = True
+) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    """Read arrays and JSON metadata from a file written by `save_npz`
+
+    Uncompressed members are memory-mapped directly from the archive, so
+    opening a file is nearly free and several processes share the same
+    pages. Compressed members, or all of them if `mmap` is False, are read
+    into memory.
+    """
+
+    arrays = {}
+
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as f:
+        for info in archive.infolist():
+            name = info.filename[: -len(".npy")]
+
+            if mmap and info.compress_type == zipfile.ZIP_STORED:
+                arrays[name] = _memmap_npz_member(path, f, info)
+            else:
+                with archive.open(info) as member:
+                    arrays[name] = np.lib.format.read_array(member)
+
+    metadata = json.loads(arrays.pop("metadata").tobytes().decode())
+
+    return arrays, metadata
+
+
+def _memmap_npz_member(
+    path: Union[Path, str], f: Any, info: zipfile.ZipInfo
+) -> np.ndarray:
+    # The local file header precedes the data, and its extra field may not
+    # match the one in the central directory.
+    f.seek(info.header_offset)
+    name_length, extra_length = struct.unpack("<26xHH", f.read(30))
+    f.seek(info.header_offset + 30 + name_length + extra_length)
+
+    version = np.lib.format.read_magic(f)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
 
-@dataclass(unsafe_hash=True)
+    if dtype.hasobject or not np.prod(shape):
+        f.seek(info.header_offset + 30 + name_length + extra_length)
+        return np.lib.format.read_array(f, allow_pickle=False)
+
+    return np.memmap(
+        path,
+        dtype=dtype,
+        mode="r",
+        offset=f.tell(),
+        shape=shape,
+        order="F" if fortran_order else "C",
+    )
+
+
+@dataclass(frozen=True)
 class Point:
     """Point in earth. Assumes a geodesical projection."""
 
+    # Points are immutable and slotted, so they take less memory and their
+    # hash is computed only once.
+    __slots__ = ("lng", "lat", "_hash")
+
     lng: float
     """Longitude (x axis)."""
 
     lat: float
     """Latitude (y axis)."""
 
+    def __post_init__(self):
+        object.__setattr__(self, "_hash", hash((self.lng, self.lat)))
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __reduce__(self):
+        # Frozen instances are rebuilt through `__init__` when pickled or
+        # copied, since their slots can not be set afterwards.
+        return self.__class__, (self.lng, self.lat)
 
-@dataclass(unsafe_hash=True)
+
+@dataclass(frozen=True)
 class Delivery:
     """A delivery request."""
 
+    __slots__ = ("id", "point", "size", "_hash")
+
     id: str
     """Unique id."""
 
@@ -51,6 +240,90 @@ class Delivery:
     size: int
     """Size it occupies in the vehicle (considered 1-D for simplicity)."""
 
+    def __post_init__(self):
+        object.__setattr__(
+            self, "_hash", hash((self.id, self.point, self.size))
+        )
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __reduce__(self):
+        return self.__class__, (self.id, self.point, self.size)
+
+
+def _point_from_dict(data: Dict[str, Any]) -> Point:
+    return Point(lng=data["lng"], lat=data["lat"])
+
+
+def _point_to_dict(point: Point) -> Dict[str, Any]:
+    return {"lng": point.lng, "lat": point.lat}
+
+
+def _deliveries_from_dicts(data: List[Dict[str, Any]]) -> List[Delivery]:
+    return [
+        Delivery(
+            id=d["id"],
+            point=Point(lng=d["point"]["lng"], lat=d["point"]["lat"]),
+            size=d["size"],
+        )
+        for d in data
+    ]
+
+
+def _deliveries_from_arrays(arrays: Dict[str, np.ndarray]) -> List[Delivery]:
+    return [
+        Delivery(
+            id=id_.decode("utf-8"), point=Point(lng=lng, lat=lat), size=size
+        )
+        for id_, (lng, lat), size in zip(
+            arrays["ids"].tolist(),
+            arrays["coords"].tolist(),
+            arrays["size"].tolist(),
+        )
+    ]
+
+
+def _iter_deliveries_from_arrays(
+    arrays: Dict[str, np.ndarray], chunk_size: int = 4096
+) -> Iterator[Delivery]:
+    """Deliveries converted from the arrays a chunk at a time, so only the
+    pages of the current chunk are read from memory-mapped arrays."""
+
+    for start in range(0, len(arrays["ids"]), chunk_size):
+        chunk = slice(start, start + chunk_size)
+
+        yield from _deliveries_from_arrays(
+            {name: arrays[name][chunk] for name in ("ids", "coords", "size")}
+        )
+
+
+def _deliveries_to_arrays(deliveries: List[Delivery]) -> Dict[str, np.ndarray]:
+    return {
+        "ids": _encode_ids([d.id for d in deliveries]),
+        "coords": np.array(
+            [(d.point.lng, d.point.lat) for d in deliveries], np.float64
+        ).reshape(-1, 2),
+        "size": np.array([d.size for d in deliveries], np.int64),
+    }
+
+
+def _encode_ids(ids: List[str]) -> np.ndarray:
+    """Array of UTF-8 encoded ids (bytes dtype)."""
+
+    return np.char.encode(np.array(ids, dtype=str), "utf-8").astype(bytes)
+
+
+def _deliveries_to_dicts(deliveries: List[Delivery]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "id": d.id,
+            "point": {"lng": d.point.lng, "lat": d.point.lat},
+            "size": d.size,
+        }
+        for d in deliveries
+    ]
+
 
 @dataclass
 class DeliveryProblemInstance(JSONDataclassMixin):
@@ -69,6 +342,43 @@ class DeliveryProblemInstance(JSONDataclassMixin):
     deliveries: List[Delivery]
     """List of deliveries to be solved."""
 
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DeliveryProblemInstance":
+        return cls(
+            name=data["name"],
+            region=data["region"],
+            max_hubs=data["max_hubs"],
+            vehicle_capacity=data["vehicle_capacity"],
+            deliveries=_deliveries_from_dicts(data["deliveries"]),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "region": self.region,
+            "max_hubs": self.max_hubs,
+            "vehicle_capacity": self.vehicle_capacity,
+            "deliveries": _deliveries_to_dicts(self.deliveries),
+        }
+
+    @classmethod
+    def from_arrays(
+        cls, arrays: Dict[str, np.ndarray], metadata: Dict[str, Any]
+    ) -> "DeliveryProblemInstance":
+        return cls(
+            name=metadata["name"],
+            region=metadata["region"],
+            max_hubs=metadata["max_hubs"],
+            vehicle_capacity=metadata["vehicle_capacity"],
+            deliveries=_deliveries_from_arrays(arrays),
+        )
+
+    def to_arrays(self) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        metadata = self.to_dict()
+        del metadata["deliveries"]
+
+        return _deliveries_to_arrays(self.deliveries), metadata
+
 
 @dataclass
 class CVRPInstance(JSONDataclassMixin):
@@ -87,9 +397,490 @@ class CVRPInstance(JSONDataclassMixin):
     deliveries: List[Delivery]
     """List of deliveries to be solved."""
 
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CVRPInstance":
+        return cls(
+            name=data["name"],
+            region=data["region"],
+            origin=_point_from_dict(data["origin"]),
+            vehicle_capacity=data["vehicle_capacity"],
+            deliveries=_deliveries_from_dicts(data["deliveries"]),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "region": self.region,
+            "origin": _point_to_dict(self.origin),
+            "vehicle_capacity": self.vehicle_capacity,
+            "deliveries": _deliveries_to_dicts(self.deliveries),
+        }
+
+    @classmethod
+    def from_arrays(
+        cls, arrays: Dict[str, np.ndarray], metadata: Dict[str, Any]
+    ) -> "CVRPInstance":
+        return cls(
+            name=metadata["name"],
+            region=metadata["region"],
+            origin=_point_from_dict(metadata["origin"]),
+            vehicle_capacity=metadata["vehicle_capacity"],
+            deliveries=_deliveries_from_arrays(arrays),
+        )
+
+    def to_arrays(self) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        metadata = {
+            "name": self.name,
+            "region": self.region,
+            "origin": _point_to_dict(self.origin),
+            "vehicle_capacity": self.vehicle_capacity,
+        }
+
+        return _deliveries_to_arrays(self.deliveries), metadata
+
+
+@dataclass
+class ColumnarCVRPInstance:
+    """Array-backed (struct-of-arrays) version of a `CVRPInstance`
+
+    Deliveries are stored as contiguous arrays instead of a list of
+    `Delivery` objects, using about an order of magnitude less memory on
+    large instances. The `coords` array can be passed to clustering and
+    distance functions without copies, and `Delivery` objects are only
+    created when accessed through `deliveries`.
+
+    Use `from_instance` and `to_instance` to convert from and to the regular
+    `CVRPInstance`, or `from_file` to load the JSON files directly.
+    """
+
+    name: str
+    """Unique name of this instance."""
+
+    region: str
+    """Region name."""
+
+    origin: Point
+    """Location of the origin hub."""
+
+    vehicle_capacity: int
+    """Maximum sum of sizes per vehicle allowed in the solution."""
+
+    ids: np.ndarray
+    """(N,) array of UTF-8 encoded delivery ids (bytes dtype)."""
+
+    coords: np.ndarray
+    """(N x 2) array of (lng, lat) delivery locations."""
+
+    size: np.ndarray
+    """(N,) array of delivery sizes."""
+
+    @classmethod
+    def from_deliveries(
+        cls,
+        name: str,
+        region: str,
+        origin: Point,
+        vehicle_capacity: int,
+        deliveries: List[Any],
+    ) -> "ColumnarCVRPInstance":
+        """Build from `Delivery` objects or their JSON dictionaries."""
+
+        if deliveries and isinstance(deliveries[0], dict):
+            ids = [d["id"] for d in deliveries]
+            coords = [
+                (d["point"]["lng"], d["point"]["lat"]) for d in deliveries
+            ]
+            size = [d["size"] for d in deliveries]
+        else:
+            ids = [d.id for d in deliveries]
+            coords = [(d.point.lng, d.point.lat) for d in deliveries]
+            size = [d.size for d in deliveries]
+
+        return cls(
+            name=name,
+            region=region,
+            origin=origin,
+            vehicle_capacity=vehicle_capacity,
+            ids=_encode_ids(ids),
+            coords=np.array(coords, dtype=np.float64).reshape(-1, 2),
+            size=np.array(size, dtype=np.int64),
+        )
+
+    @classmethod
+    def from_instance(cls, instance: CVRPInstance) -> "ColumnarCVRPInstance":
+        return cls.from_deliveries(
+            instance.name,
+            instance.region,
+            instance.origin,
+            instance.vehicle_capacity,
+            instance.deliveries,
+        )
+
+    @classmethod
+    def from_file(cls, path: Union[Path, str]) -> "ColumnarCVRPInstance":
+        """Load a `CVRPInstance` file without creating deliveries.
+
+        With the binary `.npz` format, the arrays are memory-mapped.
+        """
+
+        if Path(path).suffix == ".npz":
+            arrays, metadata = load_npz(path)
+
+            return cls(
+                name=metadata["name"],
+                region=metadata["region"],
+                origin=_point_from_dict(metadata["origin"]),
+                vehicle_capacity=metadata["vehicle_capacity"],
+                ids=arrays["ids"],
+                coords=arrays["coords"],
+                size=arrays["size"],
+            )
+
+        data = load_json(path)
+
+        return cls.from_deliveries(
+            data["name"],
+            data["region"],
+            Point(**data["origin"]),
+            data["vehicle_capacity"],
+            data["deliveries"],
+        )
+
+    def to_instance(self) -> CVRPInstance:
+        return CVRPInstance(
+            name=self.name,
+            region=self.region,
+            origin=self.origin,
+            vehicle_capacity=self.vehicle_capacity,
+            deliveries=list(self.deliveries),
+        )
+
+    def to_file(self, path: Union[Path, str]) -> None:
+        """Save in the same formats as `CVRPInstance`."""
+
+        if Path(path).suffix != ".npz":
+            self.to_instance().to_file(path)
+            return
+
+        metadata = {
+            "name": self.name,
+            "region": self.region,
+            "origin": _point_to_dict(self.origin),
+            "vehicle_capacity": self.vehicle_capacity,
+        }
+        arrays = {"ids": self.ids, "coords": self.coords, "size": self.size}
+
+        save_npz(path, arrays, metadata)
+
+    @property
+    def lng(self) -> np.ndarray:
+        return self.coords[:, 0]
+
+    @property
+    def lat(self) -> np.ndarray:
+        return self.coords[:, 1]
+
+    @property
+    def deliveries(self) -> "DeliverySequence":
+        """Read-only sequence creating `Delivery` objects on access."""
+
+        return DeliverySequence(self)
+
+    def delivery(self, index: int) -> Delivery:
+        lng, lat = self.coords[index].tolist()
+
+        return Delivery(
+            id=self.ids[index].decode("utf-8"),
+            point=Point(lng=lng, lat=lat),
+            size=int(self.size[index]),
+        )
+
+    def subinstance(self, indices: Any) -> "ColumnarCVRPInstance":
+        """Instance with only the selected deliveries.
+
+        Parameters
+        ----------
+        indices
+            Array of indices or boolean mask selecting the deliveries
+        """
+
+        return ColumnarCVRPInstance(
+            name=self.name,
+            region=self.region,
+            origin=self.origin,
+            vehicle_capacity=self.vehicle_capacity,
+            ids=self.ids[indices],
+            coords=self.coords[indices],
+            size=self.size[indices],
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+class DeliverySequence(Sequence):
+    """Lazy sequence of the deliveries of a `ColumnarCVRPInstance`."""
+
+    def __init__(self, instance: ColumnarCVRPInstance):
+        self.instance = instance
+
+    def __len__(self) -> int:
+        return len(self.instance)
+
+    def __getitem__(self, index: Any) -> Any:
+        if isinstance(index, (int, np.integer)):
+            if not -len(self) <= index < len(self):
+                raise IndexError("delivery index out of range")
+
+            return self.instance.delivery(index)
+
+        return [
+            self.instance.delivery(i)
+            for i in np.arange(len(self))[index].tolist()
+        ]
+
+
+class CVRPInstanceReader:
+    """Streaming reader of `CVRPInstance` files
+
+    Iterating over the reader yields the deliveries one at a time while the
+    file is parsed, so routing can start before the whole file is read and
+    memory stays flat. The instance metadata (name, region, origin and
+    vehicle capacity) is available as soon as the reader is created, and
+    `header` returns it as an instance without deliveries:
+
+        with CVRPInstanceReader(path) as reader:
+            model = finetune(model, reader.header)
+            for delivery in reader:
+                model = route(model, delivery)
+
+    Both the JSON and the binary `.npz` formats are supported. In JSON files
+    written with the metadata after the deliveries, the deliveries are
+    buffered until the metadata is found.
+    """
+
+    _metadata_fields = ("name", "region", "origin", "vehicle_capacity")
+
+    def __init__(self, path: Union[Path, str], chunk_size: int = 2 ** 16):
+        self.path = Path(path)
+        self.chunk_size = chunk_size
+        self.metadata: Dict[str, Any] = {}
+
+        self._file: Optional[Any] = None
+        self._buffer = ""
+        self._pos = 0
+        self._decoder = json.JSONDecoder()
+        self._buffered: List[Delivery] = []
+
+        if self.path.suffix == ".npz":
+            arrays, self.metadata = load_npz(self.path)
+            self._items = _iter_deliveries_from_arrays(arrays)
+            return
+
+        self._file = open(self.path)
+        self._items = self._parse()
+
+        # Read until the deliveries start, or further if some metadata comes
+        # after them.
+        for item in self._items:
+            if item is not None:
+                self._buffered.append(item)
+            elif all(key in self.metadata for key in self._metadata_fields):
+                break
+
+        missing = set(self._metadata_fields) - set(self.metadata)
+        if missing:
+            raise ValueError(f"{self.path} is missing the fields {missing}.")
+
+    @property
+    def header(self) -> CVRPInstance:
+        """Instance with the metadata but no deliveries."""
+
+        return CVRPInstance(
+            name=self.metadata["name"],
+            region=self.metadata["region"],
+            origin=_point_from_dict(self.metadata["origin"]),
+            vehicle_capacity=self.metadata["vehicle_capacity"],
+            deliveries=[],
+        )
+
+    def __iter__(self) -> Iterator[Delivery]:
+        buffered, self._buffered = self._buffered, []
+        yield from buffered
+
+        for item in self._items:
+            if item is not None:
+                yield item
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+
+    def __enter__(self) -> "CVRPInstanceReader":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def _parse(self) -> Iterator[Optional[Delivery]]:
+        """Parse the top level object, yielding None when the deliveries
+        start and then every delivery"""
+
+        self._expect("{")
+
+        while self._next_char() != "}":
+            key = self._decode()
+            self._expect(":")
+
+            if key != "deliveries":
+                self.metadata[key] = self._decode()
+
+            else:
+                self._expect("[")
+                yield None
+
+                while self._next_char() != "]":
+                    d = self._decode()
+                    yield Delivery(
+                        id=d["id"],
+                        point=Point(
+                            lng=d["point"]["lng"], lat=d["point"]["lat"]
+                        ),
+                        size=d["size"],
+                    )
+
+                    if self._next_char() == ",":
+                        self._pos += 1
+
+                self._pos += 1
+
+            if self._next_char() == ",":
+                self._pos += 1
+
+        self.close()
+
+    def _read_more(self) -> bool:
+        chunk = self._file.read(self.chunk_size)
+        if not chunk:
+            return False
+
+        self._buffer = self._buffer[self._pos :] + chunk
+        self._pos = 0
+
+        return True
+
+    def _next_char(self) -> str:
+        """Next non-whitespace character, without consuming it."""
+
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+
+            if not self._read_more():
+                raise ValueError(f"Unexpected end of {self.path}.")
+
+    def _expect(self, char: str) -> None:
+        if self._next_char() != char:
+            raise ValueError(f"Expected '{char}' in {self.path}.")
+
+        self._pos += 1
+
+    def _decode(self) -> Any:
+        self._next_char()
+
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._read_more():
+                    raise
+
+                continue
+
+            # Numbers may continue in the next chunk.
+            if end == len(self._buffer) and self._read_more():
+                continue
+
+            self._pos = end
+            return value
+
+
+_WHITESPACE = re.compile(r"\s*")
+
+
+class _DeliveryList(list):
+    """List counting its changes, so vehicles detect when their deliveries
+    were modified directly."""
+
+    version = 0
+
+    def _changed(self) -> None:
+        self.version += 1
+
+    def __setitem__(self, index, value):
+        super().__setitem__(index, value)
+        self._changed()
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self._changed()
+
+    def __iadd__(self, values):
+        result = super().__iadd__(values)
+        self._changed()
+        return result
+
+    def __imul__(self, n):
+        result = super().__imul__(n)
+        self._changed()
+        return result
+
+    def append(self, value):
+        super().append(value)
+        self._changed()
+
+    def extend(self, values):
+        super().extend(values)
+        self._changed()
+
+    def insert(self, index, value):
+        super().insert(index, value)
+        self._changed()
+
+    def pop(self, index=-1):
+        value = super().pop(index)
+        self._changed()
+        return value
+
+    def remove(self, value):
+        super().remove(value)
+        self._changed()
+
+    def clear(self):
+        super().clear()
+        self._changed()
+
+    def sort(self, *args, **kwargs):
+        super().sort(*args, **kwargs)
+        self._changed()
+
+    def reverse(self):
+        super().reverse()
+        self._changed()
+
 
 @dataclass
 class CVRPSolutionVehicle:
+    """Route of a single vehicle
+
+    The occupation and, if enabled with `track_distance`, the route distance
+    are cached. Use `append`, `insert`, `pop` and `remove` to change the
+    deliveries, so the occupation and distance are updated in constant time.
+    The vehicle keeps its own copy of the `deliveries` list, and any other
+    change made to it directly is detected and the caches are recomputed.
+    """
 
     origin: Point
     """Location of the origin hub."""
@@ -97,15 +888,168 @@ class CVRPSolutionVehicle:
     deliveries: List[Delivery]
     """Ordered list of deliveries from the vehicle."""
 
+    def __post_init__(self):
+        self._distance_fn: Optional[Callable[[Point, Point], float]] = None
+        self._cache_key: Optional[Tuple[int, int]] = None
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name == "deliveries" and not isinstance(value, _DeliveryList):
+            value = _DeliveryList(value)
+
+        super().__setattr__(name, value)
+
+        # A new list may reuse the id and version of a freed one, so the
+        # caches are always recomputed.
+        if name in ("deliveries", "origin"):
+            super().__setattr__("_cache_key", None)
+
     @property
     def circuit(self) -> List[Point]:
+        """Origin, the delivery points and the origin again."""
+
         return (
             [self.origin] + [d.point for d in self.deliveries] + [self.origin]
         )
 
+    @property
+    def circuit_coords(self) -> np.ndarray:
+        """(N + 2) x 2 array with the (lng, lat) of the circuit (read-only)."""
+
+        self._sync()
+
+        if self._circuit_coords is None:
+            self._circuit_coords = np.array(
+                [(p.lng, p.lat) for p in self.circuit], dtype=np.float64
+            )
+            self._circuit_coords.flags.writeable = False
+
+        return self._circuit_coords
+
     @property
     def occupation(self) -> int:
-        return sum([d.size for d in self.deliveries])
+        self._sync()
+
+        return self._occupation
+
+    @property
+    def distance(self) -> float:
+        """Circuit distance with the function given to `track_distance`."""
+
+        if self._distance_fn is None:
+            raise ValueError("Call `track_distance` to compute distances.")
+
+        self._sync()
+
+        return self._distance
+
+    def track_distance(
+        self, distance_fn: Callable[[Point, Point], float]
+    ) -> "CVRPSolutionVehicle":
+        """Keep the circuit distance updated using `distance_fn`
+
+        Parameters
+        ----------
+        distance_fn
+            Distance between two points, such as
+            `loggibud.v1.distances.great_circle_distance_m`
+        """
+
+        self._distance_fn = distance_fn
+        self._cache_key = None
+
+        return self
+
+    def append(self, delivery: Delivery) -> None:
+        self.insert(len(self.deliveries), delivery)
+
+    def insert(self, index: int, delivery: Delivery) -> None:
+        """Insert a delivery before `index`, as in `list.insert`."""
+
+        self._sync()
+        index = min(
+            max(index + len(self) if index < 0 else index, 0), len(self)
+        )
+
+        if self._distance_fn is not None:
+            prev_point, next_point = self._neighbor_points(index)
+            self._distance += (
+                self._distance_fn(prev_point, delivery.point)
+                + self._distance_fn(delivery.point, next_point)
+                - self._distance_fn(prev_point, next_point)
+            )
+
+        self.deliveries.insert(index, delivery)
+        self._occupation += delivery.size
+        self._mark_updated()
+
+    def pop(self, index: int = -1) -> Delivery:
+        """Remove and return the delivery at `index`, as in `list.pop`."""
+
+        self._sync()
+        delivery = self.deliveries.pop(index)
+        index = index + len(self) + 1 if index < 0 else index
+
+        if self._distance_fn is not None:
+            prev_point, next_point = self._neighbor_points(index)
+            self._distance -= (
+                self._distance_fn(prev_point, delivery.point)
+                + self._distance_fn(delivery.point, next_point)
+                - self._distance_fn(prev_point, next_point)
+            )
+
+        self._occupation -= delivery.size
+        self._mark_updated()
+
+        return delivery
+
+    def remove(self, delivery: Delivery) -> None:
+        """Remove the first occurrence of a delivery, as in `list.remove`."""
+
+        self.pop(self.deliveries.index(delivery))
+
+    def __len__(self) -> int:
+        return len(self.deliveries)
+
+    def _neighbor_points(self, index: int) -> Tuple[Point, Point]:
+        """Points around position `index` of the circuit deliveries."""
+
+        prev_point = (
+            self.deliveries[index - 1].point if index > 0 else self.origin
+        )
+        next_point = (
+            self.deliveries[index].point
+            if index < len(self.deliveries)
+            else self.origin
+        )
+
+        return prev_point, next_point
+
+    def _deliveries_key(self) -> Tuple[int, int]:
+        return id(self.deliveries), self.deliveries.version
+
+    def _mark_updated(self) -> None:
+        self._circuit_coords = None
+        self._cache_key = self._deliveries_key()
+
+    def _sync(self) -> None:
+        """Recompute the caches if the deliveries list changed directly."""
+
+        if self._cache_key == self._deliveries_key():
+            return
+
+        self._occupation = sum(d.size for d in self.deliveries)
+        self._circuit_coords = None
+
+        if self._distance_fn is not None:
+            circuit = [self.origin] + [d.point for d in self.deliveries]
+            circuit.append(self.origin)
+
+            self._distance = sum(
+                self._distance_fn(a, b)
+                for a, b in zip(circuit[:-1], circuit[1:])
+            )
+
+        self._cache_key = self._deliveries_key()
 
 
 @dataclass
@@ -116,3 +1060,305 @@ class CVRPSolution(JSONDataclassMixin):
     @property
     def deliveries(self):
         return [d for v in self.vehicles for d in v.deliveries]
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CVRPSolution":
+        return cls(
+            name=data["name"],
+            vehicles=[
+                CVRPSolutionVehicle(
+                    origin=_point_from_dict(v["origin"]),
+                    deliveries=_deliveries_from_dicts(v["deliveries"]),
+                )
+                for v in data["vehicles"]
+            ],
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "vehicles": [
+                {
+                    "origin": _point_to_dict(v.origin),
+                    "deliveries": _deliveries_to_dicts(v.deliveries),
+                }
+                for v in self.vehicles
+            ],
+        }
+
+    @classmethod
+    def from_arrays(
+        cls, arrays: Dict[str, np.ndarray], metadata: Dict[str, Any]
+    ) -> "CVRPSolution":
+        deliveries = _deliveries_from_arrays(arrays)
+        offsets = arrays["vehicle_offsets"].tolist()
+
+        return cls(
+            name=metadata["name"],
+            vehicles=[
+                CVRPSolutionVehicle(
+                    origin=Point(lng=lng, lat=lat),
+                    deliveries=deliveries[start:end],
+                )
+                for (lng, lat), start, end in zip(
+                    arrays["origins"].tolist(), offsets[:-1], offsets[1:]
+                )
+            ],
+        )
+
+    def to_arrays(self) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        arrays = _deliveries_to_arrays(self.deliveries)
+        arrays["vehicle_offsets"] = np.cumsum(
+            [0] + [len(v.deliveries) for v in self.vehicles], dtype=np.int64
+        )
+        arrays["origins"] = np.array(
+            [(v.origin.lng, v.origin.lat) for v in self.vehicles], np.float64
+        ).reshape(-1, 2)
+
+        return arrays, {"name": self.name}
+
+
+@dataclass
+class CompactCVRPSolution(JSONDataclassMixin):
+    """Solution storing its routes as references to the instance deliveries
+
+    Only the delivery ids of every vehicle are stored, instead of copies of
+    the deliveries, so files are much smaller and faster to read and write.
+    All vehicles leave from the instance origin. The routes can be resolved
+    against the instance as index arrays with `route_indices`, or as a
+    regular `CVRPSolution` with `to_solution` when the `Delivery` objects are
+    needed.
+
+    `from_file` also reads files in the regular `CVRPSolution` format, and
+    `to_file` writes it when the instance is provided, so both formats can
+    be used interchangeably.
+    """
+
+    name: str
+    """Unique name of the solved instance."""
+
+    routes: List[List[str]]
+    """Delivery ids visited by every vehicle, in order."""
+
+    @classmethod
+    def from_solution(cls, solution: CVRPSolution) -> "CompactCVRPSolution":
+        return cls(
+            name=solution.name,
+            routes=[[d.id for d in v.deliveries] for v in solution.vehicles],
+        )
+
+    @classmethod
+    def from_indices(
+        cls,
+        instance: Union[CVRPInstance, ColumnarCVRPInstance],
+        delivery_indices: np.ndarray,
+        vehicle_offsets: np.ndarray,
+    ) -> "CompactCVRPSolution":
+        """Build from routes given as indices into the instance deliveries
+
+        The `v`-th vehicle visits the deliveries
+        `delivery_indices[vehicle_offsets[v]:vehicle_offsets[v + 1]]`.
+        """
+
+        ids = np.char.decode(_as_columnar(instance).ids, "utf-8")[
+            np.asarray(delivery_indices, dtype=np.int64)
+        ].tolist()
+        offsets = np.asarray(vehicle_offsets).tolist()
+
+        return cls(
+            name=instance.name,
+            routes=[
+                ids[start:end] for start, end in zip(offsets, offsets[1:])
+            ],
+        )
+
+    def route_indices(
+        self, instance: Union[CVRPInstance, ColumnarCVRPInstance]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Routes as indices into the instance deliveries
+
+        Returns
+        -------
+        delivery_indices, vehicle_offsets
+            The `v`-th vehicle visits the deliveries
+            `delivery_indices[vehicle_offsets[v]:vehicle_offsets[v + 1]]`.
+            Raises a `KeyError` if any id is not in the instance
+        """
+
+        instance_ids = _as_columnar(instance).ids
+        route_ids = _encode_ids([i for route in self.routes for i in route])
+
+        # Match ids with a binary search over the sorted instance ids.
+        order = np.argsort(instance_ids, kind="stable")
+        sorted_ids = instance_ids[order]
+        positions = np.searchsorted(sorted_ids, route_ids).clip(
+            max=max(len(sorted_ids) - 1, 0)
+        )
+
+        if len(sorted_ids):
+            found = sorted_ids[positions] == route_ids
+        else:
+            found = np.zeros(len(route_ids), dtype=bool)
+
+        if not found.all():
+            missing = np.char.decode(route_ids[~found], "utf-8")
+            raise KeyError(f"Unknown delivery ids {missing[:5].tolist()}.")
+
+        delivery_indices = order[positions].astype(np.int64)
+        vehicle_offsets = np.cumsum(
+            [0] + [len(route) for route in self.routes], dtype=np.int64
+        )
+
+        return delivery_indices, vehicle_offsets
+
+    def circuit_indices(
+        self, instance: Union[CVRPInstance, ColumnarCVRPInstance]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Vehicle circuits as indices into the origin (index 0) followed by
+        the instance deliveries (index `i + 1`)
+
+        Returns
+        -------
+        circuit_indices, path_offsets
+            The `v`-th circuit is
+            `circuit_indices[path_offsets[v]:path_offsets[v + 1]]`, starting
+            and ending at the origin
+        """
+
+        delivery_indices, vehicle_offsets = self.route_indices(instance)
+
+        num_vehicles = len(self.routes)
+        path_offsets = vehicle_offsets + 2 * np.arange(num_vehicles + 1)
+
+        # The k-th delivery of the v-th vehicle goes after 2 v + 1 origins.
+        vehicles = np.repeat(np.arange(num_vehicles), np.diff(vehicle_offsets))
+        positions = np.arange(len(delivery_indices)) + 2 * vehicles + 1
+
+        circuit_indices = np.zeros(path_offsets[-1], dtype=np.int64)
+        circuit_indices[positions] = delivery_indices + 1
+
+        return circuit_indices, path_offsets
+
+    def circuit_paths(
+        self, instance: Union[CVRPInstance, ColumnarCVRPInstance]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Coordinates and offsets of the vehicle circuits, starting and
+        ending at the origin, as expected by the path distance functions."""
+
+        columnar_instance = _as_columnar(instance)
+        circuit_indices, path_offsets = self.circuit_indices(
+            columnar_instance
+        )
+
+        coords = np.concatenate(
+            (
+                [(instance.origin.lng, instance.origin.lat)],
+                columnar_instance.coords,
+            )
+        )
+
+        return coords[circuit_indices], path_offsets
+
+    def to_solution(
+        self, instance: Union[CVRPInstance, ColumnarCVRPInstance]
+    ) -> CVRPSolution:
+        """Resolve the routes into a regular solution."""
+
+        delivery_indices, vehicle_offsets = self.route_indices(instance)
+        deliveries = instance.deliveries
+        offsets = vehicle_offsets.tolist()
+
+        return CVRPSolution(
+            name=self.name,
+            vehicles=[
+                CVRPSolutionVehicle(
+                    origin=instance.origin,
+                    deliveries=[
+                        deliveries[i]
+                        for i in delivery_indices[start:end].tolist()
+                    ],
+                )
+                for start, end in zip(offsets, offsets[1:])
+            ],
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CompactCVRPSolution":
+        if "vehicles" in data:
+            return cls.from_solution(CVRPSolution.from_dict(data))
+
+        return cls(name=data["name"], routes=data["routes"])
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"name": self.name, "routes": self.routes}
+
+    @classmethod
+    def from_arrays(
+        cls, arrays: Dict[str, np.ndarray], metadata: Dict[str, Any]
+    ) -> "CompactCVRPSolution":
+        if "coords" in arrays:
+            return cls.from_solution(
+                CVRPSolution.from_arrays(arrays, metadata)
+            )
+
+        ids = np.char.decode(arrays["ids"], "utf-8").tolist()
+        offsets = arrays["vehicle_offsets"].tolist()
+
+        return cls(
+            name=metadata["name"],
+            routes=[
+                ids[start:end] for start, end in zip(offsets, offsets[1:])
+            ],
+        )
+
+    def to_arrays(self) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        arrays = {
+            "ids": _encode_ids([i for route in self.routes for i in route]),
+            "vehicle_offsets": np.cumsum(
+                [0] + [len(route) for route in self.routes], dtype=np.int64
+            ),
+        }
+
+        return arrays, {"name": self.name}
+
+    def to_file(
+        self,
+        path: Union[Path, str],
+        instance: Optional[Union[CVRPInstance, ColumnarCVRPInstance]] = None,
+    ) -> None:
+        """Save to a file, in the regular format if `instance` is given."""
+
+        if instance is not None:
+            self.to_solution(instance).to_file(path)
+        else:
+            super().to_file(path)
+
+
+def _as_columnar(
+    instance: Union[CVRPInstance, ColumnarCVRPInstance],
+) -> ColumnarCVRPInstance:
+    if isinstance(instance, ColumnarCVRPInstance):
+        return instance
+
+    return ColumnarCVRPInstance.from_instance(instance)
+
+
+def load_solution(
+    path: Union[Path, str],
+) -> Union[CVRPSolution, CompactCVRPSolution]:
+    """Load a solution file in either the regular or the compact format."""
+
+    if Path(path).suffix == ".npz":
+        arrays, metadata = load_npz(path)
+
+        if "coords" in arrays:
+            return CVRPSolution.from_arrays(arrays, metadata)
+
+        return CompactCVRPSolution.from_arrays(arrays, metadata)
+
+    data = load_json(path)
+
+    if "routes" in data:
+        return CompactCVRPSolution.from_dict(data)
+
+    return CVRPSolution.from_dict(data)
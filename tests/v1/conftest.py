@@ -3,7 +3,24 @@ import json
 import pytest
 from dacite import from_dict
 
-from loggibud.v1.types import CVRPInstance
+from loggibud.v1.distances import GreatCircleDistanceProvider
+from loggibud.v1.types import CVRPInstance, CVRPSolution, CVRPSolutionVehicle
+
+
+class CountingProvider(GreatCircleDistanceProvider):
+    """Great circle distances counting the matrices and paths computed"""
+
+    def __init__(self):
+        self.num_matrices = 0
+        self.num_paths = 0
+
+    def matrix(self, points):
+        self.num_matrices += 1
+        return super().matrix(points)
+
+    def path_distances(self, coords, offsets):
+        self.num_paths += len(offsets) - 1
+        return super().path_distances(coords, offsets)
 
 
 @pytest.fixture
@@ -12,3 +29,30 @@ def toy_cvrp_instance():
         data = json.load(f)
 
     return from_dict(CVRPInstance, data)
+
+
+@pytest.fixture
+def toy_cvrp_solution(toy_cvrp_instance):
+    """Feasible solution with vehicles filled in the order of deliveries"""
+
+    vehicles = []
+    for delivery in toy_cvrp_instance.deliveries:
+        if (
+            not vehicles
+            or vehicles[-1].occupation + delivery.size
+            > toy_cvrp_instance.vehicle_capacity
+        ):
+            vehicles.append(
+                CVRPSolutionVehicle(
+                    origin=toy_cvrp_instance.origin, deliveries=[]
+                )
+            )
+
+        vehicles[-1].append(delivery)
+
+    return CVRPSolution(name=toy_cvrp_instance.name, vehicles=vehicles)
+
+
+@pytest.fixture
+def counting_provider():
+    return CountingProvider()
@@ -1,27 +1,73 @@
-import pytest
-from mock import patch
+import numpy as np
 
 from loggibud.v1 import data_conversion
-from loggibud.v1.distances import calculate_distance_matrix_great_circle_m
+from loggibud.v1.types import (
+    CVRPInstance,
+    CVRPSolution,
+    CVRPSolutionVehicle,
+    ColumnarCVRPInstance,
+    CompactCVRPSolution,
+    load_json,
+)
 
 
-@pytest.fixture
-def mocked_osrm_distance_matrix():
-    """Monkey-patch the OSRM distance matrix with the Great Circle"""
-
-    with patch(
-        "loggibud.v1.data_conversion.calculate_distance_matrix_m",
-        new=calculate_distance_matrix_great_circle_m,
-    ) as mock_osrm:
-        yield mock_osrm
-
-
-def test_can_create_proper_tsplib_from_instance(
-    toy_cvrp_instance, mocked_osrm_distance_matrix
-):
-    tsplib_instance = data_conversion.to_tsplib(toy_cvrp_instance)
+def test_can_create_proper_tsplib_from_instance(toy_cvrp_instance):
+    params = data_conversion.TSPLIBConversionParams(
+        distance_provider="great_circle"
+    )
+    tsplib_instance = data_conversion.to_tsplib(toy_cvrp_instance, params)
     tspfile = str(tsplib_instance)
 
     assert toy_cvrp_instance.name in tspfile
     assert "ACVRP" in tspfile
     assert str(toy_cvrp_instance.vehicle_capacity) in tspfile
+
+
+def test_convert_directory_to_npz(tmp_path, toy_cvrp_instance):
+    """Ensure directories convert to the binary format and back"""
+    solution = CVRPSolution(
+        name=toy_cvrp_instance.name,
+        vehicles=[
+            CVRPSolutionVehicle(
+                origin=toy_cvrp_instance.origin,
+                deliveries=toy_cvrp_instance.deliveries[:5],
+            )
+        ],
+    )
+    (tmp_path / "json" / "solutions").mkdir(parents=True)
+    toy_cvrp_instance.to_file(tmp_path / "json" / "instance.json")
+    solution.to_file(tmp_path / "json" / "solutions" / "solution.json")
+    compact_solution = CompactCVRPSolution.from_solution(solution)
+    compact_solution.to_file(tmp_path / "json" / "solutions" / "compact.json")
+
+    data_conversion.convert_directory(tmp_path / "json", tmp_path / "npz")
+    data_conversion.convert_directory(
+        tmp_path / "npz", tmp_path / "back", "json"
+    )
+
+    columnar_instance = ColumnarCVRPInstance.from_file(
+        tmp_path / "npz" / "instance.npz"
+    )
+
+    assert isinstance(columnar_instance.coords, np.memmap)
+    assert CVRPInstance.from_file(tmp_path / "npz" / "instance.npz") == (
+        toy_cvrp_instance
+    )
+    assert CVRPInstance.from_file(tmp_path / "back" / "instance.json") == (
+        toy_cvrp_instance
+    )
+    assert (
+        CVRPSolution.from_file(
+            tmp_path / "back" / "solutions" / "solution.json"
+        )
+        == solution
+    )
+    assert (
+        CompactCVRPSolution.from_file(
+            tmp_path / "back" / "solutions" / "compact.json"
+        )
+        == compact_solution
+    )
+    assert "routes" in load_json(
+        tmp_path / "back" / "solutions" / "compact.json"
+    )
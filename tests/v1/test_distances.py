@@ -1,10 +1,35 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.parse import unquote
+
 import numpy as np
+import polyline
 import pytest
+from mock import MagicMock, patch
 
 from loggibud.v1.distances import (
+    DistanceMatrix,
+    DistanceMatrixCache,
+    GreatCircleDistanceProvider,
+    IncrementalDistanceMatrix,
+    LocalProjection,
+    OSRMClient,
+    OSRMConfig,
+    PrecomputedDistanceProvider,
+    calculate_distance_matrix_m,
+    calculate_distance_matrix_equirectangular_m,
     calculate_distance_matrix_great_circle_m,
+    calculate_neighbor_graph_m,
+    calculate_neighbor_graph_great_circle_m,
+    calculate_path_distances_great_circle_m,
     calculate_route_distance_great_circle_m,
+    calculate_route_distances_m,
+    get_distance_provider,
+    routes_to_paths,
 )
+from loggibud.v1.types import Point
 
 
 @pytest.fixture
@@ -29,3 +54,416 @@ def test_great_circle_route_distance(toy_cvrp_points):
     route_distance = calculate_route_distance_great_circle_m(toy_cvrp_points)
 
     assert route_distance > 0
+
+
+def _mocked_osrm_response(url, timeout=None):
+    """Answer an OSRM request with Great Circle distances"""
+    path, _, query = url.partition("?")
+    params = dict(param.split("=") for param in query.split("&"))
+
+    coords_uri = unquote(path.split("/")[-1])
+    if coords_uri.startswith("polyline6("):
+        points = [
+            Point(lng, lat)
+            for lat, lng in polyline.decode(coords_uri[10:-1], 6)
+        ]
+    else:
+        points = [
+            Point(*map(float, coords.split(",")))
+            for coords in coords_uri.split(";")
+        ]
+
+    response = MagicMock()
+    response.elapsed = timedelta(milliseconds=1)
+    response.content = b"{}"
+
+    waypoints = [{"hint": f"{p.lng:.6f},{p.lat:.6f}"} for p in points]
+
+    if "/route/" in path:
+        response.json.return_value = {
+            "routes": [
+                {"distance": calculate_route_distance_great_circle_m(points)}
+            ],
+            "waypoints": waypoints,
+        }
+        return response
+
+    distance_matrix = calculate_distance_matrix_great_circle_m(points)
+
+    sources = (
+        [int(i) for i in params["sources"].split(";")]
+        if "sources" in params
+        else range(len(points))
+    )
+    destinations = (
+        [int(i) for i in params["destinations"].split(";")]
+        if "destinations" in params
+        else range(len(points))
+    )
+
+    response.json.return_value = {
+        "distances": distance_matrix[np.ix_(sources, destinations)].tolist(),
+        "sources": [waypoints[i] for i in sources],
+        "destinations": [waypoints[i] for i in destinations],
+    }
+    return response
+
+
+@pytest.fixture
+def mocked_osrm():
+    """Monkey-patch OSRM requests with the Great Circle distances"""
+
+    with patch(
+        "loggibud.v1.distances.requests.Session.get",
+        side_effect=_mocked_osrm_response,
+    ) as mock_get:
+        yield mock_get
+
+
+def test_distance_matrix_cache(tmp_path, toy_cvrp_points, mocked_osrm):
+    """Ensure repeated matrix requests are served from the disk cache"""
+    config = OSRMConfig(cache_dir=str(tmp_path))
+
+    first_matrix = calculate_distance_matrix_m(toy_cvrp_points, config)
+    second_matrix = calculate_distance_matrix_m(toy_cvrp_points, config)
+
+    assert mocked_osrm.call_count == 1
+    assert isinstance(second_matrix, np.memmap)
+    assert np.array_equal(first_matrix, second_matrix)
+
+    # Given arrays are returned on both cache misses and hits.
+    for num_points in [10, 10]:
+        out = np.empty((num_points, num_points))
+        distance_matrix = calculate_distance_matrix_m(
+            toy_cvrp_points[:num_points], config, out=out
+        )
+
+        assert distance_matrix is out
+        assert np.array_equal(out, first_matrix[:num_points, :num_points])
+
+
+def test_distance_matrix_cache_eviction(tmp_path):
+    """Ensure the least recently used matrices are evicted first"""
+    matrix = np.ones((16, 16))
+    cache = DistanceMatrixCache(tmp_path, max_size_bytes=2 * 16 * 16 * 8 + 512)
+
+    cache.put("a", matrix)
+    cache.put("b", matrix)
+
+    # Make "a" older than "b" and then access it again.
+    os.utime(tmp_path / "a.npy", (0, 0))
+    assert cache.get("a") is not None
+
+    cache.put("c", matrix)
+
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
+
+
+def test_tiled_distance_matrix(tmp_path, toy_cvrp_points, mocked_osrm):
+    """Ensure tiled requests assemble the same matrix as a single request"""
+    expected_matrix = calculate_distance_matrix_m(toy_cvrp_points)
+
+    config = OSRMConfig(max_table_size=30, max_workers=3)
+    out = np.lib.format.open_memmap(
+        tmp_path / "matrix.npy", mode="w+", shape=expected_matrix.shape
+    )
+    distance_matrix = calculate_distance_matrix_m(
+        toy_cvrp_points, config, out=out
+    )
+
+    # One full request and the tiles.
+    num_blocks = int(np.ceil(len(toy_cvrp_points) / 15))
+    assert mocked_osrm.call_count == 1 + num_blocks**2
+    assert distance_matrix is out
+    assert np.allclose(distance_matrix, expected_matrix)
+
+
+def test_concurrent_route_distances(toy_cvrp_points, mocked_osrm, monkeypatch):
+    """Ensure batched routes are evaluated and recorded by the client"""
+    monkeypatch.setattr(OSRMClient, "max_records", 2)
+    routes = [toy_cvrp_points[i : i + 10] for i in range(0, 50, 10)]
+    client = OSRMClient(OSRMConfig(max_workers=3))
+
+    route_distances = calculate_route_distances_m(routes, client=client)
+
+    assert np.allclose(
+        route_distances,
+        [calculate_route_distance_great_circle_m(p) for p in routes],
+    )
+    assert client.summary()["num_requests"] == len(routes)
+    assert len(client.records) == 2
+    assert all(r.service == "route" for r in client.records)
+
+
+def test_osrm_hints_reuse(toy_cvrp_points, mocked_osrm):
+    """Ensure hints of known points are sent back in later routes only"""
+    client = OSRMClient(OSRMConfig(use_hints=True, use_polyline=True))
+    client.prefetch_hints(toy_cvrp_points)
+
+    client.route_distance(toy_cvrp_points[:5])
+
+    url = mocked_osrm.call_args[0][0]
+    hints = unquote(url.split("&hints=")[1]).split(";")
+    assert "polyline6(" in url
+    assert hints == [f"{p.lng:.6f},{p.lat:.6f}" for p in toy_cvrp_points[:5]]
+
+    client.table(toy_cvrp_points[:5])
+    assert "&hints=" not in mocked_osrm.call_args[0][0]
+
+    # Plain coordinates without hints are sent by default.
+    OSRMClient(OSRMConfig()).route_distance(toy_cvrp_points[:5])
+
+    url = mocked_osrm.call_args[0][0]
+    assert "polyline6(" not in url and "&hints=" not in url
+
+
+@pytest.mark.parametrize("use_osrm", [True, False])
+def test_neighbor_graph(toy_cvrp_points, mocked_osrm, use_osrm):
+    """Ensure the sparse graph keeps the nearest neighbors and the depot"""
+    num_points = len(toy_cvrp_points)
+    distance_matrix = calculate_distance_matrix_great_circle_m(toy_cvrp_points)
+
+    if use_osrm:
+        neighbor_graph = calculate_neighbor_graph_m(
+            toy_cvrp_points,
+            num_neighbors=5,
+            config=OSRMConfig(max_table_size=40),
+        )
+    else:
+        neighbor_graph = calculate_neighbor_graph_great_circle_m(
+            toy_cvrp_points, num_neighbors=5
+        )
+
+    assert neighbor_graph.shape == (num_points, num_points)
+    assert neighbor_graph[0].nnz == num_points
+    assert np.allclose(
+        neighbor_graph[:, 0].toarray().ravel(),
+        distance_matrix[:, 0],
+        rtol=1e-3,
+    )
+
+    for i in range(1, num_points):
+        row = neighbor_graph[i]
+        neighbors = set(row.indices) - {0}
+        row_distances = distance_matrix[i].copy()
+        row_distances[i] = np.inf
+        expected = set(np.argsort(row_distances)[:5]) - {0}
+
+        assert neighbors >= expected
+        assert np.allclose(
+            row.data, distance_matrix[i, row.indices], rtol=1e-3
+        )
+
+
+def test_great_circle_distance_blocks(tmp_path, toy_cvrp_points):
+    """Ensure blocked computations write the same matrix into `out`"""
+    distance_matrix = calculate_distance_matrix_great_circle_m(toy_cvrp_points)
+
+    out = np.lib.format.open_memmap(
+        tmp_path / "matrix.npy",
+        mode="w+",
+        dtype=np.float32,
+        shape=distance_matrix.shape,
+    )
+    blocked_matrix = calculate_distance_matrix_great_circle_m(
+        toy_cvrp_points, out=out, block_size=16, max_workers=2
+    )
+
+    assert blocked_matrix is out
+    assert np.allclose(blocked_matrix, distance_matrix, atol=1e-2)
+
+
+def test_great_circle_path_distances(toy_cvrp_points):
+    """Ensure every path length matches its own route distance"""
+    routes = [toy_cvrp_points[:10], [], toy_cvrp_points[10:11]]
+    routes.append(toy_cvrp_points[11:])
+
+    path_distances = calculate_path_distances_great_circle_m(
+        *routes_to_paths(routes)
+    )
+
+    assert path_distances.shape == (len(routes),)
+    assert path_distances[1] == path_distances[2] == 0
+
+    # Compare with the consecutive entries of the full distance matrix.
+    distance_matrix = calculate_distance_matrix_great_circle_m(routes[0])
+    assert path_distances[0] == pytest.approx(
+        np.diag(distance_matrix, k=1).sum()
+    )
+
+
+@pytest.mark.parametrize("name", ["great_circle", "equirectangular"])
+def test_distance_providers(toy_cvrp_points, name):
+    """Ensure registered providers agree with the Great Circle distances"""
+    provider = get_distance_provider(name)
+    distance_matrix = calculate_distance_matrix_great_circle_m(toy_cvrp_points)
+
+    routes = [toy_cvrp_points[:10], toy_cvrp_points[10:]]
+    path_distances = provider.path_distances(*routes_to_paths(routes))
+    neighbor_graph = provider.neighbor_graph(toy_cvrp_points, 5)
+
+    assert np.allclose(
+        provider.matrix(toy_cvrp_points), distance_matrix, rtol=1e-2
+    )
+    assert np.allclose(
+        path_distances,
+        [calculate_route_distance_great_circle_m(p) for p in routes],
+        rtol=1e-2,
+    )
+    assert neighbor_graph.shape == distance_matrix.shape
+
+
+def test_cached_and_precomputed_providers(tmp_path, toy_cvrp_points):
+    """Ensure cached and precomputed providers return the stored distances"""
+    config = OSRMConfig(cache_dir=str(tmp_path / "cache"))
+    provider = get_distance_provider("cached:great_circle", config)
+
+    distance_matrix = provider.matrix(toy_cvrp_points)
+    assert isinstance(provider.matrix(toy_cvrp_points), np.memmap)
+
+    PrecomputedDistanceProvider.save(
+        tmp_path / "matrix.npz", toy_cvrp_points, distance_matrix
+    )
+    provider = get_distance_provider(f"precomputed:{tmp_path}/matrix.npz")
+
+    points = toy_cvrp_points[10:20]
+    routes = [points[:3], points[3:]]
+    path_distances = provider.path_distances(*routes_to_paths(routes))
+
+    assert np.allclose(provider.matrix(points), distance_matrix[10:20, 10:20])
+    assert np.allclose(
+        path_distances,
+        [calculate_route_distance_great_circle_m(p) for p in routes],
+    )
+
+
+def test_cached_osrm_provider(tmp_path, toy_cvrp_points, mocked_osrm):
+    """Ensure cached OSRM matrices are keyed by host and written once"""
+    cache_dir = tmp_path / "cache"
+    points = toy_cvrp_points[:10]
+
+    for host in ["http://a:5000", "http://b:5000", "http://a:5000"]:
+        config = OSRMConfig(host=host, cache_dir=str(cache_dir))
+        get_distance_provider("cached:osrm", config).matrix(points)
+
+    assert mocked_osrm.call_count == 2
+    assert len(list(cache_dir.glob("*.npy"))) == 2
+    assert isinstance(
+        calculate_distance_matrix_m(points, config=config), np.memmap
+    )
+    assert mocked_osrm.call_count == 2
+
+
+def test_equirectangular_error_bound(toy_cvrp_points):
+    """Ensure the local projection error is within its reported bound"""
+    projection = LocalProjection.from_points(toy_cvrp_points)
+
+    distance_matrix = calculate_distance_matrix_great_circle_m(toy_cvrp_points)
+    approximate_matrix = calculate_distance_matrix_equirectangular_m(
+        toy_cvrp_points, projection=projection
+    )
+
+    mask = distance_matrix > 0
+    relative_error = np.abs(
+        approximate_matrix[mask] / distance_matrix[mask] - 1
+    )
+
+    assert relative_error.max() <= projection.max_relative_error < 1e-2
+
+
+@pytest.mark.parametrize(
+    "name", ["osrm", "great_circle", "equirectangular", "precomputed"]
+)
+def test_distance_submatrix(tmp_path, toy_cvrp_points, mocked_osrm, name):
+    """Ensure submatrices match the corresponding full matrix entries"""
+    if name == "precomputed":
+        PrecomputedDistanceProvider.save(
+            tmp_path / "matrix.npz",
+            toy_cvrp_points,
+            calculate_distance_matrix_great_circle_m(toy_cvrp_points),
+        )
+        name = f"precomputed:{tmp_path}/matrix.npz"
+
+    provider = get_distance_provider(name, OSRMConfig(max_table_size=30))
+    sources, destinations = [3, 50, 7], list(range(0, 100, 2))
+
+    submatrix = provider.submatrix(toy_cvrp_points, sources, destinations)
+    distance_matrix = provider.matrix(toy_cvrp_points)
+
+    assert submatrix.shape == (3, 50)
+    assert np.allclose(
+        submatrix, distance_matrix[np.ix_(sources, destinations)], rtol=1e-3
+    )
+
+
+def test_lazy_distance_matrix(toy_cvrp_points):
+    """Ensure lazy matrices fetch rows on demand within the cache bound"""
+    num_points = len(toy_cvrp_points)
+    distance_matrix = DistanceMatrix(
+        toy_cvrp_points, "great_circle", max_cache_bytes=10 * 8 * num_points
+    )
+    expected_matrix = calculate_distance_matrix_great_circle_m(toy_cvrp_points)
+
+    assert distance_matrix.shape == expected_matrix.shape
+    assert distance_matrix[3, 5] == pytest.approx(expected_matrix[3, 5])
+    assert np.allclose(distance_matrix[3], expected_matrix[3])
+    assert np.allclose(distance_matrix[10:40], expected_matrix[10:40])
+    assert np.allclose(
+        distance_matrix.block([1, 2], [4, 8]),
+        expected_matrix[[1, 2]][:, [4, 8]],
+    )
+
+    assert len(distance_matrix._rows) == 10
+    assert all(row.base is None for row in distance_matrix._rows.values())
+    assert distance_matrix.hits == 1
+    assert distance_matrix.misses == 33
+
+    # Negative indices count from the end, as in arrays.
+    assert np.allclose(distance_matrix[-1], expected_matrix[-1])
+    assert distance_matrix[-2, 0] == pytest.approx(expected_matrix[-2, 0])
+
+    for key in [num_points, (num_points + 2, 0), -num_points - 1]:
+        with pytest.raises(IndexError):
+            distance_matrix[key]
+
+
+def test_lazy_distance_matrix_concurrent_eviction(toy_cvrp_points):
+    """Ensure rows evicted by other threads are still returned"""
+
+    class SlowProvider(GreatCircleDistanceProvider):
+        def submatrix(self, points, sources, destinations):
+            time.sleep(0.001)
+            return super().submatrix(points, sources, destinations)
+
+    num_points = len(toy_cvrp_points)
+    distance_matrix = DistanceMatrix(
+        toy_cvrp_points, SlowProvider(), max_cache_bytes=2 * 8 * num_points
+    )
+    expected_matrix = calculate_distance_matrix_great_circle_m(toy_cvrp_points)
+
+    rng = np.random.default_rng(0)
+    requests = [rng.choice(5, size=3) for _ in range(200)]
+
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(distance_matrix.rows, requests))
+
+    for indices, rows in zip(requests, results):
+        assert np.allclose(rows, expected_matrix[indices])
+
+
+@pytest.mark.parametrize("name", ["osrm", "great_circle"])
+def test_incremental_distance_matrix(toy_cvrp_points, mocked_osrm, name):
+    """Ensure appended points extend the matrix with their row and column"""
+    distance_matrix = IncrementalDistanceMatrix(name, initial_capacity=4)
+
+    for point in toy_cvrp_points[:10]:
+        distance_matrix.append(point)
+    distance_matrix.extend(toy_cvrp_points[10:])
+
+    expected_matrix = calculate_distance_matrix_great_circle_m(toy_cvrp_points)
+
+    assert len(distance_matrix) == len(toy_cvrp_points)
+    assert distance_matrix.capacity < 2 * len(toy_cvrp_points)
+    assert np.allclose(distance_matrix.matrix, expected_matrix, rtol=1e-3)
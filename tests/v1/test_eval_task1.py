@@ -0,0 +1,183 @@
+import json
+
+import pytest
+
+from loggibud.v1.distances import (
+    calculate_distance_matrix_great_circle_m,
+    calculate_route_distance_great_circle_m,
+    PrecomputedDistanceProvider,
+)
+from loggibud.v1.eval.task1 import (
+    compare_evaluation_modes,
+    evaluate_files,
+    evaluate_solution,
+    match_solution_files,
+)
+from loggibud.v1.types import (
+    CVRPSolution,
+    CompactCVRPSolution,
+    load_solution,
+)
+
+
+def test_great_circle_evaluation(toy_cvrp_instance, toy_cvrp_solution):
+    """Ensure offline scoring matches the sum of every route distance"""
+    total_distance = evaluate_solution(
+        toy_cvrp_instance, toy_cvrp_solution, distance_provider="great_circle"
+    )
+
+    expected_distance = sum(
+        calculate_route_distance_great_circle_m(vehicle.circuit)
+        for vehicle in toy_cvrp_solution.vehicles
+    )
+
+    assert total_distance == pytest.approx(expected_distance / 1_000)
+
+
+def test_compact_solution_evaluation(
+    tmp_path, toy_cvrp_instance, toy_cvrp_solution
+):
+    """Ensure compact solutions round trip and score as the regular ones"""
+    compact_solution = CompactCVRPSolution.from_solution(toy_cvrp_solution)
+    compact_solution.to_file(tmp_path / "compact.json")
+    compact_solution.to_file(tmp_path / "regular.json", toy_cvrp_instance)
+
+    assert load_solution(tmp_path / "compact.json") == compact_solution
+    assert load_solution(tmp_path / "regular.json") == toy_cvrp_solution
+    assert compact_solution.to_solution(toy_cvrp_instance) == (
+        toy_cvrp_solution
+    )
+    assert (
+        CompactCVRPSolution.from_indices(
+            toy_cvrp_instance,
+            *compact_solution.route_indices(toy_cvrp_instance),
+        )
+        == compact_solution
+    )
+
+    assert evaluate_solution(
+        toy_cvrp_instance, compact_solution, distance_provider="great_circle"
+    ) == evaluate_solution(
+        toy_cvrp_instance, toy_cvrp_solution, distance_provider="great_circle"
+    )
+
+    # Remove every occurrence of a delivery.
+    missing_id = compact_solution.routes[0][0]
+    compact_solution.routes = [
+        [i for i in route if i != missing_id]
+        for route in compact_solution.routes
+    ]
+    with pytest.raises(AssertionError):
+        evaluate_solution(
+            toy_cvrp_instance,
+            compact_solution,
+            distance_provider="great_circle",
+        )
+
+
+def test_matrix_evaluation(
+    tmp_path, toy_cvrp_instance, toy_cvrp_solution, counting_provider
+):
+    """Ensure the matrix mode scores all routes from a single matrix"""
+    provider = counting_provider
+    compact_solution = CompactCVRPSolution.from_solution(toy_cvrp_solution)
+    route_distance = evaluate_solution(
+        toy_cvrp_instance, toy_cvrp_solution, distance_provider="great_circle"
+    )
+
+    for solution in (toy_cvrp_solution, compact_solution):
+        assert evaluate_solution(
+            toy_cvrp_instance,
+            solution,
+            distance_provider=provider,
+            mode="matrix",
+        ) == pytest.approx(route_distance)
+
+    assert provider.num_matrices == 2
+
+    comparison = compare_evaluation_modes(
+        toy_cvrp_instance, toy_cvrp_solution, distance_provider="great_circle"
+    )
+    assert comparison["route_km"] == route_distance
+    assert comparison["max_route_difference_km"] == pytest.approx(0.0)
+
+    # Score offline from a precomputed matrix.
+    points = [toy_cvrp_instance.origin] + [
+        d.point for d in toy_cvrp_instance.deliveries
+    ]
+    PrecomputedDistanceProvider.save(
+        tmp_path / "matrix.npz",
+        points,
+        calculate_distance_matrix_great_circle_m(points),
+    )
+    assert evaluate_solution(
+        toy_cvrp_instance,
+        compact_solution,
+        distance_provider=f"precomputed:{tmp_path / 'matrix.npz'}",
+        mode="matrix",
+    ) == pytest.approx(route_distance)
+
+
+def test_evaluate_files(tmp_path, toy_cvrp_instance, toy_cvrp_solution):
+    """Ensure file evaluation writes one result per pair"""
+    (tmp_path / "instances").mkdir()
+    (tmp_path / "solutions").mkdir()
+
+    toy_cvrp_instance.to_file(tmp_path / "instances" / "a.json")
+    toy_cvrp_solution.to_file(tmp_path / "solutions" / "a.json")
+    toy_cvrp_instance.to_file(tmp_path / "instances" / "b.json")
+    CVRPSolution(name="b", vehicles=toy_cvrp_solution.vehicles[1:]).to_file(
+        tmp_path / "solutions" / "b.json"
+    )
+
+    pairs = match_solution_files(
+        tmp_path / "instances", tmp_path / "solutions"
+    )
+    results = evaluate_files(
+        pairs,
+        distance_provider="great_circle",
+        num_workers=1,
+        output_path=tmp_path / "results.jsonl",
+    )
+
+    with open(tmp_path / "results.jsonl") as f:
+        written = {r["name"]: r for r in map(json.loads, f)}
+
+    assert [r["name"] for r in results] == ["a", "b"]
+    assert written["a"]["distance_km"] == evaluate_solution(
+        toy_cvrp_instance, toy_cvrp_solution, distance_provider="great_circle"
+    )
+    assert written["a"]["num_vehicles"] == len(toy_cvrp_solution.vehicles)
+    assert written["b"]["distance_km"] is None
+    assert written["b"]["error"] is not None
+
+
+def test_evaluate_files_pool(tmp_path, toy_cvrp_instance, toy_cvrp_solution):
+    """Ensure worker processes report broken files without stopping"""
+    (tmp_path / "instances").mkdir()
+    (tmp_path / "solutions").mkdir()
+
+    for name in ["a", "b", "c"]:
+        toy_cvrp_instance.to_file(tmp_path / "instances" / f"{name}.json")
+
+    toy_cvrp_solution.to_file(tmp_path / "solutions" / "a.json")
+    toy_cvrp_solution.to_file(tmp_path / "solutions" / "b.json")
+    (tmp_path / "solutions" / "c.json").write_text("{")
+
+    pairs = match_solution_files(
+        tmp_path / "instances", tmp_path / "solutions"
+    )
+    results = evaluate_files(
+        pairs,
+        distance_provider="great_circle",
+        num_workers=2,
+        output_path=tmp_path / "results.csv",
+    )
+    results = {r["name"]: r for r in results}
+
+    assert set(results) == {"a", "b", "c"}
+    assert results["a"]["distance_km"] == results["b"]["distance_km"]
+    assert results["a"]["distance_km"] is not None
+    assert results["a"]["error"] is None
+    assert results["c"]["distance_km"] is None
+    assert results["c"]["error"]
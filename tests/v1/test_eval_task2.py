@@ -0,0 +1,72 @@
+from types import ModuleType
+
+import pytest
+
+from loggibud.v1.baselines.shared.ortools import ORToolsParams
+from loggibud.v1.baselines.task2 import kmeans_greedy
+from loggibud.v1.eval.task1 import evaluate_solution
+from loggibud.v1.eval.task2 import evaluate_instance, replay_instance
+
+
+@pytest.fixture
+def kmeans_greedy_model(toy_cvrp_instance):
+    params = kmeans_greedy.KMeansGreedyParams(
+        fixed_num_clusters=10,
+        ortools_tsp_params=ORToolsParams(
+            max_vehicles=1, time_limit_ms=100, distance_provider="great_circle"
+        ),
+    )
+    return kmeans_greedy.pretrain([toy_cvrp_instance], params=params)
+
+
+def test_replay_instance(toy_cvrp_instance, kmeans_greedy_model):
+    """Ensure replays report latencies and feasible solutions"""
+    solution, metrics = replay_instance(
+        "kmeans_greedy", kmeans_greedy_model, toy_cvrp_instance
+    )
+
+    assert metrics["num_deliveries"] == len(toy_cvrp_instance.deliveries)
+    assert metrics["num_vehicles"] == len(solution.vehicles)
+    assert (
+        0
+        < metrics["route_p50_ms"]
+        <= metrics["route_p95_ms"]
+        <= metrics["route_p99_ms"]
+        <= metrics["route_max_ms"]
+    )
+    assert metrics["finish_s"] > 0
+    assert metrics["peak_memory_mb"] > 0
+    assert evaluate_solution(
+        toy_cvrp_instance, solution, distance_provider="great_circle"
+    )
+
+
+def test_reversed_routing(toy_cvrp_instance, kmeans_greedy_model):
+    """Ensure solvers moving routed deliveries are rejected"""
+    solver = ModuleType("moving_solver")
+    solver.finetune = kmeans_greedy.finetune
+    solver.finish = kmeans_greedy.finish
+
+    def route(model, delivery):
+        model = kmeans_greedy.route(model, delivery)
+
+        # Move a routed delivery from the first vehicle to the second one.
+        vehicles = [v for s in model.cluster_subsolutions.values() for v in s]
+        if len(vehicles) > 1 and vehicles[0].deliveries:
+            delivery = vehicles[0].pop()
+            vehicles[1].append(delivery)
+
+        return model
+
+    solver.route = route
+
+    result = evaluate_instance(
+        solver,
+        kmeans_greedy_model,
+        toy_cvrp_instance,
+        distance_provider="great_circle",
+        trace_memory=False,
+    )
+
+    assert result["distance_km"] is None
+    assert result["error"] is not None
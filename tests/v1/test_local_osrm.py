@@ -0,0 +1,118 @@
+import sqlite3
+
+import numpy as np
+import pytest
+
+from loggibud.v1.distances import (
+    EdgeDistanceCache,
+    OSRMClient,
+    OSRMConfig,
+    calculate_distance_matrix_m,
+    calculate_distance_matrix_great_circle_m,
+    calculate_route_distances_m,
+)
+from loggibud.v1.local_osrm import LocalOSRMServer
+
+
+@pytest.fixture
+def toy_cvrp_points(toy_cvrp_instance):
+    return [delivery.point for delivery in toy_cvrp_instance.deliveries]
+
+
+@pytest.fixture
+def local_osrm_server():
+    with LocalOSRMServer(detour_factor=1.5, max_table_size=60) as server:
+        yield server
+
+
+def test_local_osrm_tiled_table(local_osrm_server, toy_cvrp_points):
+    """Ensure tiled tables fit the server limit and match the scaled matrix"""
+    config = OSRMConfig(host=local_osrm_server.url, max_table_size=60)
+
+    distance_matrix = calculate_distance_matrix_m(toy_cvrp_points, config)
+    expected_matrix = 1.5 * calculate_distance_matrix_great_circle_m(
+        toy_cvrp_points
+    )
+
+    assert np.allclose(distance_matrix, expected_matrix, atol=1.0)
+
+
+def test_local_osrm_connection_reuse(local_osrm_server, toy_cvrp_points):
+    """Ensure concurrent route requests reuse the pooled connections"""
+    config = OSRMConfig(host=local_osrm_server.url, max_workers=2)
+    client = OSRMClient(config)
+    routes = [toy_cvrp_points[i : i + 5] for i in range(0, 100, 5)]
+
+    route_distances = calculate_route_distances_m(routes, client=client)
+
+    assert len(route_distances) == len(routes)
+    assert all(distance > 0 for distance in route_distances)
+    assert local_osrm_server.num_requests == len(routes)
+    assert local_osrm_server.num_connections <= 2
+
+
+def test_local_osrm_edge_cache(tmp_path, local_osrm_server, toy_cvrp_points):
+    """Ensure cached legs and pairs are not requested again"""
+    config = OSRMConfig(
+        host=local_osrm_server.url,
+        max_table_size=60,
+        edge_cache_path=str(tmp_path / "edges.sqlite"),
+    )
+    cache = EdgeDistanceCache.for_path(config.edge_cache_path)
+    routes = [toy_cvrp_points[i : i + 5] for i in range(0, 50, 5)]
+
+    route_distances = calculate_route_distances_m(routes, config)
+    num_requests = local_osrm_server.num_requests
+
+    assert calculate_route_distances_m(routes, config) == route_distances
+    assert local_osrm_server.num_requests == num_requests
+    assert cache.stats()["hits"] == cache.stats()["misses"] == 40
+
+    # Route legs are not reused by matrices, and the diagonal is not counted.
+    cache.reset_stats()
+    distance_matrix = calculate_distance_matrix_m(toy_cvrp_points[:60], config)
+    num_requests = local_osrm_server.num_requests
+
+    assert cache.stats()["hits"] == 0
+    assert cache.stats()["misses"] == 60 * 59
+    assert np.allclose(
+        distance_matrix,
+        calculate_distance_matrix_m(toy_cvrp_points[:60], config),
+    )
+    assert local_osrm_server.num_requests == num_requests
+    assert cache.stats()["hits"] == 60 * 59
+    assert np.allclose(
+        route_distances[0], np.diag(distance_matrix, k=1)[:4].sum()
+    )
+
+
+def test_local_osrm_edge_cache_servers(tmp_path, monkeypatch, toy_cvrp_points):
+    """Ensure servers sharing an edge cache do not reuse their distances"""
+    monkeypatch.setattr(EdgeDistanceCache, "flush_interval_s", 3600.0)
+    path = tmp_path / "edges.sqlite"
+    routes = [toy_cvrp_points[i : i + 5] for i in range(0, 50, 5)]
+    route_distances = []
+
+    for detour_factor in [1.5, 2.0]:
+        with LocalOSRMServer(detour_factor=detour_factor) as server:
+            config = OSRMConfig(host=server.url, edge_cache_path=str(path))
+            route_distances.append(calculate_route_distances_m(routes, config))
+
+            assert server.num_requests > 0
+
+    assert np.allclose(
+        np.divide(route_distances[1], route_distances[0]), 2.0 / 1.5
+    )
+
+    # Counters are written in batches, and always before reading them.
+    cache = EdgeDistanceCache.for_path(path)
+    cache.reset_stats()
+    cache.record(hits=3, misses=1)
+
+    with sqlite3.connect(path) as connection:
+        assert dict(connection.execute("SELECT * FROM stats")) == {
+            "hits": 0,
+            "misses": 0,
+        }
+
+    assert cache.stats()["hit_rate"] == 0.75
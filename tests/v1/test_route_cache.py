@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from loggibud.v1.eval.route_cache import RouteDistanceCache, route_key
+from loggibud.v1.eval.task1 import evaluate_solution
+from loggibud.v1.types import CVRPSolutionVehicle
+
+
+def test_route_key(toy_cvrp_instance):
+    origin, deliveries = toy_cvrp_instance.origin, toy_cvrp_instance.deliveries
+
+    assert route_key(origin, deliveries[:3]) == route_key(
+        origin, list(deliveries[:3])
+    )
+    assert route_key(origin, deliveries[:3]) != route_key(
+        origin, deliveries[2::-1]
+    )
+    assert route_key(origin, []) != route_key(deliveries[0].point, [])
+
+
+def test_route_cache_rescore(
+    toy_cvrp_instance, toy_cvrp_solution, counting_provider
+):
+    """Ensure only new routes are computed"""
+    provider = counting_provider
+    cache = RouteDistanceCache(provider)
+    num_vehicles = len(toy_cvrp_solution.vehicles)
+
+    distance_km = cache.evaluate(toy_cvrp_instance, toy_cvrp_solution)
+    assert distance_km == evaluate_solution(
+        toy_cvrp_instance, toy_cvrp_solution, distance_provider="great_circle"
+    )
+    assert cache.evaluate(toy_cvrp_instance, toy_cvrp_solution) == (
+        distance_km
+    )
+    assert provider.num_paths == num_vehicles
+    assert cache.hits == num_vehicles
+
+    # Move the last delivery of the first vehicle into a new one.
+    route_distances = cache.route_distances(toy_cvrp_solution.vehicles)
+    delivery = toy_cvrp_solution.vehicles[0].pop()
+    toy_cvrp_solution.vehicles.append(
+        CVRPSolutionVehicle(
+            origin=toy_cvrp_instance.origin, deliveries=[delivery]
+        )
+    )
+
+    route_distances = cache.rescore(
+        toy_cvrp_solution, [0, num_vehicles], route_distances
+    )
+
+    assert provider.num_paths == num_vehicles + 2
+    assert np.allclose(
+        route_distances,
+        RouteDistanceCache("great_circle").route_distances(
+            toy_cvrp_solution.vehicles
+        ),
+    )
+    assert round(route_distances.sum() / 1_000, 4) == evaluate_solution(
+        toy_cvrp_instance, toy_cvrp_solution, distance_provider="great_circle"
+    )
+
+    with pytest.raises(ValueError):
+        cache.rescore(toy_cvrp_solution, [0], route_distances[:-1])
+
+    # Removing a vehicle from the middle shifts the following ones.
+    del toy_cvrp_solution.vehicles[1]
+
+    with pytest.raises(ValueError):
+        cache.rescore(toy_cvrp_solution, [1], route_distances)
+
+    assert np.allclose(
+        cache.rescore(
+            toy_cvrp_solution, range(1, num_vehicles + 1), route_distances
+        ),
+        np.delete(route_distances, 1),
+    )
@@ -0,0 +1,252 @@
+import json
+import pickle
+from copy import deepcopy
+from dataclasses import FrozenInstanceError, asdict, replace
+
+import numpy as np
+import pytest
+from dacite import from_dict
+
+from loggibud.v1 import types
+from loggibud.v1.distances import (
+    calculate_route_distance_great_circle_m,
+    great_circle_distance_m,
+)
+from loggibud.v1.types import (
+    CVRPInstance,
+    CVRPInstanceReader,
+    CVRPSolution,
+    CVRPSolutionVehicle,
+    ColumnarCVRPInstance,
+    Point,
+)
+
+
+def test_columnar_instance(tmp_path, toy_cvrp_instance):
+    """Ensure columnar instances convert losslessly and build lazily"""
+    toy_cvrp_instance.to_file(tmp_path / "instance.json")
+    columnar_instance = ColumnarCVRPInstance.from_file(
+        tmp_path / "instance.json"
+    )
+
+    assert columnar_instance.coords.shape == (len(columnar_instance), 2)
+    assert columnar_instance.deliveries[3] == toy_cvrp_instance.deliveries[3]
+    assert (
+        columnar_instance.deliveries[-2:] == toy_cvrp_instance.deliveries[-2:]
+    )
+    assert columnar_instance.to_instance() == toy_cvrp_instance
+
+    subinstance = columnar_instance.subinstance(columnar_instance.size > 5)
+
+    assert all(d.size > 5 for d in subinstance.deliveries)
+    assert np.shares_memory(subinstance.lng, subinstance.coords)
+
+    columnar_instance.to_file(tmp_path / "columnar.json")
+    assert CVRPInstance.from_file(tmp_path / "columnar.json") == (
+        toy_cvrp_instance
+    )
+
+
+def test_slotted_types(toy_cvrp_instance):
+    """Ensure slotted deliveries hash, copy and pickle as before"""
+    delivery = toy_cvrp_instance.deliveries[0]
+    copied = pickle.loads(pickle.dumps(delivery))
+
+    assert not hasattr(delivery, "__dict__")
+    assert copied == deepcopy(delivery) == delivery
+    assert hash(copied) == hash(delivery)
+    assert len(set(toy_cvrp_instance.deliveries + [copied])) == len(
+        set(toy_cvrp_instance.deliveries)
+    )
+
+    with pytest.raises(FrozenInstanceError):
+        delivery.size = 0
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_json_round_trip(monkeypatch, tmp_path, toy_cvrp_instance, use_orjson):
+    """Ensure the fast JSON path matches dacite and asdict"""
+    if not use_orjson:
+        monkeypatch.setattr(types, "orjson", None)
+
+    toy_cvrp_instance.to_file(tmp_path / "instance.json")
+    solution = CVRPSolution(
+        name=toy_cvrp_instance.name,
+        vehicles=[
+            CVRPSolutionVehicle(
+                origin=toy_cvrp_instance.origin,
+                deliveries=toy_cvrp_instance.deliveries[:10],
+            )
+        ],
+    )
+    solution.to_file(tmp_path / "solution.json")
+
+    with open(tmp_path / "instance.json") as f:
+        data = json.load(f)
+
+    assert data == asdict(toy_cvrp_instance)
+    assert CVRPInstance.from_dict(data) == from_dict(CVRPInstance, data)
+    assert CVRPInstance.from_file(tmp_path / "instance.json") == (
+        toy_cvrp_instance
+    )
+    assert CVRPSolution.from_file(tmp_path / "solution.json") == solution
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_json_numpy(monkeypatch, tmp_path, toy_cvrp_instance, use_orjson):
+    """Ensure numpy values, as in generated instances, are written as JSON"""
+    if not use_orjson:
+        monkeypatch.setattr(types, "orjson", None)
+
+    origin = toy_cvrp_instance.origin
+    instance = replace(
+        toy_cvrp_instance,
+        origin=Point(lng=np.float64(origin.lng), lat=np.float64(origin.lat)),
+        vehicle_capacity=np.int64(toy_cvrp_instance.vehicle_capacity),
+    )
+    instance.to_file(tmp_path / "instance.json")
+
+    assert CVRPInstance.from_file(tmp_path / "instance.json") == (
+        toy_cvrp_instance
+    )
+
+
+@pytest.mark.parametrize("suffix", [".json", ".npz"])
+def test_instance_reader(tmp_path, toy_cvrp_instance, suffix):
+    """Ensure the streaming reader yields the same deliveries"""
+    path = tmp_path / f"instance{suffix}"
+    toy_cvrp_instance.to_file(path)
+
+    with CVRPInstanceReader(path, chunk_size=100) as reader:
+        header = reader.header
+        deliveries = list(reader)
+
+    assert deliveries == toy_cvrp_instance.deliveries
+    assert header.origin == toy_cvrp_instance.origin
+    assert header.vehicle_capacity == toy_cvrp_instance.vehicle_capacity
+
+
+def test_instance_reader_npz_chunks(monkeypatch, tmp_path, toy_cvrp_instance):
+    """Ensure binary files are converted lazily, a chunk at a time"""
+    instance = replace(
+        toy_cvrp_instance, deliveries=toy_cvrp_instance.deliveries * 50
+    )
+    instance.to_file(tmp_path / "instance.npz")
+
+    chunk_sizes = []
+    deliveries_from_arrays = types._deliveries_from_arrays
+
+    def counting_deliveries_from_arrays(arrays):
+        chunk_sizes.append(len(arrays["ids"]))
+        return deliveries_from_arrays(arrays)
+
+    monkeypatch.setattr(
+        types, "_deliveries_from_arrays", counting_deliveries_from_arrays
+    )
+
+    with CVRPInstanceReader(tmp_path / "instance.npz") as reader:
+        assert not chunk_sizes
+
+        deliveries = iter(reader)
+        assert next(deliveries) == instance.deliveries[0]
+        assert chunk_sizes == [4096]
+
+        assert [instance.deliveries[0], *deliveries] == instance.deliveries
+        assert sum(chunk_sizes) == len(instance.deliveries)
+        assert max(chunk_sizes) == 4096
+
+
+def test_vehicle_cached_aggregates(toy_cvrp_instance):
+    """Ensure vehicle aggregates follow the incremental updates"""
+    deliveries = toy_cvrp_instance.deliveries[:20]
+    vehicle = CVRPSolutionVehicle(
+        origin=toy_cvrp_instance.origin, deliveries=[]
+    ).track_distance(great_circle_distance_m)
+
+    for delivery in deliveries[:10]:
+        vehicle.append(delivery)
+    vehicle.insert(0, deliveries[10])
+    vehicle.insert(5, deliveries[11])
+    vehicle.pop()
+    vehicle.remove(deliveries[0])
+
+    expected_deliveries = [deliveries[10]] + deliveries[1:4]
+    expected_deliveries += [deliveries[11]] + deliveries[4:9]
+
+    assert vehicle.deliveries == expected_deliveries
+    assert vehicle.occupation == sum(d.size for d in expected_deliveries)
+    assert vehicle.distance == pytest.approx(
+        calculate_route_distance_great_circle_m(vehicle.circuit)
+    )
+    assert np.allclose(
+        vehicle.circuit_coords[[0, -1]],
+        [[vehicle.origin.lng, vehicle.origin.lat]] * 2,
+    )
+
+    # Direct changes to the list are detected as well.
+    vehicle.deliveries.append(deliveries[19])
+
+    assert vehicle.circuit[-2] == deliveries[19].point
+    assert vehicle.occupation == sum(
+        d.size for d in expected_deliveries + [deliveries[19]]
+    )
+
+
+def test_vehicle_in_place_changes(toy_cvrp_instance):
+    """Ensure replacing or reordering deliveries in place updates caches"""
+    deliveries = toy_cvrp_instance.deliveries[:20]
+    vehicle = CVRPSolutionVehicle(
+        origin=toy_cvrp_instance.origin, deliveries=deliveries[:10]
+    ).track_distance(great_circle_distance_m)
+    coords = vehicle.circuit_coords
+
+    vehicle.deliveries[0], vehicle.deliveries[1] = deliveries[1], deliveries[0]
+    vehicle.deliveries[2:4] = deliveries[10:12]
+    vehicle.deliveries.reverse()
+
+    expected_deliveries = deliveries[1::-1] + deliveries[10:12]
+    expected_deliveries = (expected_deliveries + deliveries[4:10])[::-1]
+
+    assert vehicle.deliveries == expected_deliveries
+    assert vehicle.occupation == sum(d.size for d in expected_deliveries)
+    assert vehicle.circuit[1:-1] == [d.point for d in expected_deliveries]
+    assert vehicle.distance == pytest.approx(
+        calculate_route_distance_great_circle_m(vehicle.circuit)
+    )
+    assert not np.array_equal(vehicle.circuit_coords, coords)
+
+    # The vehicle keeps its own list, and the circuit is a new list.
+    vehicle.circuit.pop()
+    deliveries.clear()
+
+    assert len(vehicle.circuit) == len(expected_deliveries) + 2
+    assert pickle.loads(pickle.dumps(vehicle)).deliveries == (
+        expected_deliveries
+    )
+
+
+def test_vehicle_reassigned_attributes(toy_cvrp_instance):
+    """Ensure reassigning the deliveries or origin updates the caches"""
+    deliveries = toy_cvrp_instance.deliveries
+    vehicle = CVRPSolutionVehicle(
+        origin=toy_cvrp_instance.origin, deliveries=deliveries[:1]
+    ).track_distance(great_circle_distance_m)
+
+    for num_deliveries in [1, 2, 3, 2, 3]:
+        vehicle.deliveries = [
+            replace(d, size=num_deliveries)
+            for d in deliveries[:num_deliveries]
+        ]
+
+        assert vehicle.occupation == num_deliveries ** 2
+        assert vehicle.distance == pytest.approx(
+            calculate_route_distance_great_circle_m(vehicle.circuit)
+        )
+
+    coords = vehicle.circuit_coords
+    vehicle.origin = deliveries[-1].point
+
+    assert vehicle.distance == pytest.approx(
+        calculate_route_distance_great_circle_m(vehicle.circuit)
+    )
+    assert not np.array_equal(vehicle.circuit_coords, coords)
@@ -0,0 +1,82 @@
+import pytest
+
+from loggibud.v1.eval.validation import validate_solution
+from loggibud.v1.types import (
+    CVRPSolution,
+    CVRPSolutionVehicle,
+    CompactCVRPSolution,
+    Delivery,
+    Point,
+)
+
+
+@pytest.fixture
+def toy_compact_solution(toy_cvrp_instance):
+    """Feasible solution with one vehicle per delivery"""
+
+    return CompactCVRPSolution(
+        name=toy_cvrp_instance.name,
+        routes=[[d.id] for d in toy_cvrp_instance.deliveries],
+    )
+
+
+def test_feasible_solution(toy_cvrp_instance, toy_compact_solution):
+    report = validate_solution(toy_cvrp_instance, toy_compact_solution)
+    regular_report = validate_solution(
+        toy_cvrp_instance, toy_compact_solution.to_solution(toy_cvrp_instance)
+    )
+
+    assert report.is_feasible
+    assert regular_report.is_feasible
+    assert report.num_vehicles == len(toy_cvrp_instance.deliveries)
+    report.raise_if_infeasible()
+
+
+def test_report_every_violation(toy_cvrp_instance):
+    """Ensure all violations are reported at once"""
+    missing, duplicate, *others = toy_cvrp_instance.deliveries
+    routes = [
+        [duplicate.id, "unknown", duplicate.id],
+        [d.id for d in others],
+    ]
+
+    report = validate_solution(
+        toy_cvrp_instance,
+        CompactCVRPSolution(name=toy_cvrp_instance.name, routes=routes),
+    )
+    violations = {v.kind: v for v in report.violations}
+
+    assert not report.is_feasible
+    assert set(violations) == {"missing", "duplicate", "unknown", "capacity"}
+    assert violations["missing"].delivery_ids == [missing.id]
+    assert violations["duplicate"].delivery_ids == [duplicate.id]
+    assert violations["unknown"].delivery_ids == ["unknown"]
+    assert violations["capacity"].vehicle == 1
+
+    with pytest.raises(AssertionError, match="4 violations"):
+        report.raise_if_infeasible()
+
+
+def test_report_mismatch_and_origins(toy_cvrp_instance):
+    """Ensure regular solutions are checked against the instance values"""
+    first, *others = toy_cvrp_instance.deliveries
+    solution = CVRPSolution(
+        name=toy_cvrp_instance.name,
+        vehicles=[
+            CVRPSolutionVehicle(
+                origin=Point(lng=0.0, lat=0.0),
+                deliveries=[Delivery(id=first.id, point=first.point, size=0)],
+            ),
+            *(
+                CVRPSolutionVehicle(
+                    origin=toy_cvrp_instance.origin, deliveries=[delivery]
+                )
+                for delivery in others
+            ),
+        ],
+    )
+
+    report = validate_solution(toy_cvrp_instance, solution)
+
+    assert [v.kind for v in report.violations] == ["mismatch", "origin"]
+    assert report.violations[0].delivery_ids == [first.id]